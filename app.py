@@ -1,27 +1,38 @@
 import re
-import logging
 import streamlit as st
 
-from morse import text_to_morse
+from disk_cache import default_cache
+from meters import TIME_SIGNATURES, get_meter
+from midi import midi_bytes_from_events
+from morse import text_to_morse, tokens_to_text
 from rhythm import (
+    annotations_for_bars,
     events_to_steps,
     morse_to_events_with_spans,
     split_into_bars,
-    timing_scale,
-    units_per_beat,
+    token_step_count,
+    truncate_events,
+    truncate_tokens,
 )
-from render_svg import labels_for_bar, render_bar_svg
+from render_budget import plan_render
+from render_svg import render_score_svg
+from telemetry import log_event, setup_logging, text_fingerprint, usage_metrics
 from utils import sanitize_text, load_css
-from components import build_morse_metronome_wave, wav_bytes_from_audio
-
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
+from components import (
+    bar_unit_range,
+    build_morse_metronome_wave,
+    build_morse_range_wave,
+    span_unit_range,
+    wav_bytes_from_audio,
+    wav_cache_params,
 )
 
 
-logger = logging.getLogger("morse_rhythm")
+# JSON log records are written by a background listener, not this thread
+logger = setup_logging()
+metrics = usage_metrics()
+metrics.record_rerun()
+cache = default_cache()
 
 
 def format_morse_tokens(tokens):
@@ -35,6 +46,64 @@ def format_morse_tokens(tokens):
             parts.append("|")
     return " ".join(parts)
 
+
+def render_wav(text, bpm, time_sig, metronome_on, sample_rate=44100, max_units=None):
+    audio, sample_rate = build_morse_metronome_wave(
+        text,
+        bpm,
+        time_sig=time_sig,
+        metronome_enabled=metronome_on,
+        sample_rate=sample_rate,
+        max_units=max_units,
+    )
+    return wav_bytes_from_audio(audio, sample_rate)
+
+
+def render_range_wav(text, bpm, time_sig, metronome_on, unit_range, count_in, loops, sample_rate):
+    audio, sample_rate = build_morse_range_wave(
+        text,
+        bpm,
+        time_sig=time_sig,
+        start_unit=unit_range[0],
+        end_unit=unit_range[1],
+        count_in=count_in,
+        loops=loops,
+        metronome_enabled=metronome_on,
+        sample_rate=sample_rate,
+    )
+    return wav_bytes_from_audio(audio, sample_rate)
+
+
+def degradation_notice(plan, bar_count):
+    # Plain-language summary of what plan_render turned off for this rerun
+    parts = []
+    if "show_char_brackets" in plan["degradations"]:
+        parts.append("character brackets hidden")
+    if "show_inactive_labels" in plan["degradations"]:
+        parts.append("inactive counts hidden")
+    if "sample_rate" in plan["degradations"]:
+        parts.append(f"audio at {plan['sample_rate'] / 1000:g} kHz")
+    if plan["max_bars"] is not None:
+        parts.append(f"showing and playing the first {plan['max_bars']} of {bar_count} bars")
+    return "Long input, rendered faster: " + ", ".join(parts) + "."
+
+
+def render_score(bars, spans, meter, show_inactive_labels, show_char_brackets):
+    bar_annotations = None
+    if show_char_brackets:
+        bar_annotations = annotations_for_bars(spans, len(bars), meter.bar_units)
+    # One SVG document for the whole score; repeated paths and bars are
+    # defined once
+    return render_score_svg(
+        bars,
+        meter,
+        annotations=bar_annotations,
+        show_inactive_labels=show_inactive_labels,
+        width=SVG_WIDTH,
+        height=SVG_HEIGHT,
+        row_gap=SVG_ROW_GAP,
+    )
+
 # Load shared CSS before any UI elements render
 load_css("styles/app.css")
 load_css("styles/textarea.css")
@@ -45,6 +114,7 @@ st.markdown("Convert text into rhythms")
 
 SVG_WIDTH = 720
 SVG_HEIGHT = 120
+SVG_ROW_GAP = 64
 
 st.markdown("""
 <div style="
@@ -61,11 +131,11 @@ with text_c:
     text = st.text_input("Enter text", value="", key="test")
     time_sig = st.radio(
         "Time signature",
-        ["4/4", "12/8"],
-        # ["3/4", "4/4", "5/4", "6/4", "7/4", "6/8", "9/8", "12/8"],
+        TIME_SIGNATURES,
+        index=TIME_SIGNATURES.index("4/4"),
         horizontal=True
     )
-    numerator, denominator = (int(part) for part in time_sig.split("/"))
+    meter = get_meter(time_sig)
     show_inactive_labels = st.checkbox("Show all counts (1 e + a)", value=True)
     st.caption("Without this, only the notes being played have counts beneath them.")
     show_char_brackets = st.checkbox("Show individual characters", value=True)
@@ -74,14 +144,10 @@ with text_c:
     # Normalize input so other functions never sees None
     clean_text = sanitize_text(text)
     tokens = text_to_morse(clean_text)
-    scale = timing_scale(numerator, denominator)
-    events, spans = morse_to_events_with_spans(tokens, unit_scale=scale)
-    steps = events_to_steps(events)
-
-    units = units_per_beat(denominator)
-    bar_units = numerator * units
-    bars = split_into_bars(steps, bar_units)
-    labels = labels_for_bar(numerator, denominator)
+    # Events and steps wait for the render plan so huge pastes only build
+    # the bars that will be shown
+    step_count = token_step_count(tokens, unit_scale=meter.unit_scale)
+    bar_units = meter.bar_units
 
 
     if not clean_text.strip():
@@ -121,6 +187,45 @@ with text_c:
     bpm = st.select_slider("Select a tempo (bpm):", options=vals)
     metronome_on = st.checkbox("Metronome click", value=True)
 
+    # Keep long inputs inside the render budget; the plan says what to drop
+    plan = plan_render(
+        step_count,
+        meter,
+        bpm,
+        show_char_brackets=show_char_brackets,
+        show_inactive_labels=show_inactive_labels,
+        text_length=len(clean_text),
+    )
+    full_bar_count = -(-step_count // bar_units)
+    max_units = None
+    audio_text = clean_text
+    if plan["max_bars"] is not None:
+        max_steps = plan["max_bars"] * bar_units
+        max_units = max_steps * meter.audio_units_per_step
+        # Only the letters that start inside the kept bars are parsed or
+        # synthesized; the rest of the paste never reaches the grids
+        tokens = truncate_tokens(tokens, max_steps, unit_scale=meter.unit_scale)
+        audio_text = tokens_to_text(tokens)
+    # Event data is shared through the disk cache like the renders;
+    # audio_text always tokenizes back to exactly these tokens
+    parsed = cache.get_or_create_json(
+        "events",
+        {"text": audio_text, "unit_scale": meter.unit_scale},
+        lambda: dict(
+            zip(
+                ("events", "spans"),
+                morse_to_events_with_spans(tokens, unit_scale=meter.unit_scale),
+            )
+        ),
+    )
+    events, spans = parsed["events"], parsed["spans"]
+    steps = events_to_steps(events)
+    bars = split_into_bars(steps, bar_units)
+    midi_events, midi_spans = events, spans
+    if plan["max_bars"] is not None:
+        bars = bars[: plan["max_bars"]]
+        midi_events, midi_spans = truncate_events(events, spans, max_steps)
+
     if clean_text.strip():
         log_payload = {
             "text": clean_text,
@@ -131,28 +236,110 @@ with text_c:
             "tempo_bpm": bpm,
         }
         if st.session_state.get("last_log_payload") != log_payload:
-            logger.info(
-                "user_input text=%s time_signature=%s show_inactive_labels=%s "
-                "show_char_brackets=%s metronome_on=%s tempo_bpm=%s",
-                clean_text,
-                time_sig,
-                show_inactive_labels,
-                show_char_brackets,
-                metronome_on,
-                bpm,
+            metrics.record_input(clean_text, time_sig, bpm)
+            log_event(
+                logger,
+                "user_input",
+                time_signature=time_sig,
+                show_inactive_labels=show_inactive_labels,
+                show_char_brackets=show_char_brackets,
+                metronome_on=metronome_on,
+                tempo_bpm=bpm,
+                degradations=plan["degradations"],
+                **text_fingerprint(clean_text),
             )
             st.session_state["last_log_payload"] = log_payload
 
     if clean_text.strip():
-        audio, sample_rate = build_morse_metronome_wave(
-            clean_text,
+        audio_params = wav_cache_params(
+            audio_text,
             bpm,
             time_sig=time_sig,
             metronome_enabled=metronome_on,
+            sample_rate=plan["sample_rate"],
+            max_units=max_units,
+        )
+        # Shared disk cache first; only synthesize on a miss
+        wav_bytes = cache.get_or_create(
+            "wav",
+            audio_params,
+            lambda: render_wav(
+                audio_text,
+                bpm,
+                time_sig,
+                metronome_on,
+                sample_rate=plan["sample_rate"],
+                max_units=max_units,
+            ),
         )
-        wav_bytes = wav_bytes_from_audio(audio, sample_rate)
         if wav_bytes:
             st.audio(wav_bytes, format="audio/wav")
+        midi_bytes = midi_bytes_from_events(
+            midi_events,
+            bpm,
+            time_sig=time_sig,
+            spans=midi_spans,
+            metronome_enabled=metronome_on,
+        )
+        if midi_bytes:
+            st.download_button(
+                "Download MIDI",
+                data=midi_bytes,
+                file_name="morse_rhythm.mid",
+                mime="audio/midi",
+            )
+
+        # Loop one section without rendering the bars before it; text with
+        # nothing encodable has no bars or characters to pick from
+        if bars and spans:
+            with st.expander("Practice a section"):
+                loop_by = st.radio("Loop", ("Bars", "Characters"), horizontal=True)
+                if loop_by == "Bars":
+                    bar_numbers = list(range(1, len(bars) + 1))
+                    first_bar, last_bar = 1, 1
+                    if len(bar_numbers) > 1:
+                        first_bar, last_bar = st.select_slider(
+                            "Bars", options=bar_numbers, value=(1, 1)
+                        )
+                    unit_range = bar_unit_range(meter, first_bar - 1, last_bar)
+                else:
+                    shown_spans = [
+                        span for span in spans if span["start"] < len(bars) * bar_units
+                    ]
+                    first_char, last_char = 0, 0
+                    if len(shown_spans) > 1:
+                        first_char, last_char = st.select_slider(
+                            "Characters",
+                            options=list(range(len(shown_spans))),
+                            value=(0, 0),
+                            format_func=lambda i: f"{i + 1}: {shown_spans[i]['label']}",
+                        )
+                    unit_range = span_unit_range(meter, spans, first_char, last_char)
+                loops = st.number_input("Repetitions", min_value=1, max_value=16, value=4)
+                range_count_in = st.checkbox("Count-in", value=True)
+                range_params = dict(
+                    audio_params,
+                    start_unit=unit_range[0],
+                    end_unit=unit_range[1],
+                    count_in=range_count_in,
+                    loops=int(loops),
+                )
+                range_wav = cache.get_or_create(
+                    "wav_range",
+                    range_params,
+                    lambda: render_range_wav(
+                        audio_text,
+                        bpm,
+                        time_sig,
+                        metronome_on,
+                        unit_range,
+                        range_count_in,
+                        int(loops),
+                        plan["sample_rate"],
+                    ),
+                )
+                if range_wav:
+                    st.audio(range_wav, format="audio/wav")
     st.caption("Audio will start with a one measure countoff")
 
 with morse_c:
@@ -161,40 +348,32 @@ with morse_c:
     else:
         qs = '"'
         st.html(f"<h2 style='text-align:center;'>{qs}{text.upper()}{qs} in {time_sig}</h2>")
-        last_index = len(bars) - 1
-        svg_rows = []
-        svg_list = []
-        # Render each bar as a separate SVG row
-        for idx, bar_steps in enumerate(bars):
-            bar_start = idx * bar_units
-            bar_end = bar_start + bar_units - 1
-            bar_spans = []
-            if show_char_brackets:
-                for span in spans:
-                    if span["end"] < bar_start or span["start"] > bar_end:
-                        continue
-                    bar_spans.append(
-                            {
-                                "start": span["start"] - bar_start,
-                                "end": span["end"] - bar_start,
-                                "label": span["label"],
-                            }
-                    )
-            svg = render_bar_svg(
-                bar_steps,
-                labels,
-                units,
-                denominator,
-                is_last_bar=idx == last_index,
-                show_inactive_labels=show_inactive_labels,
-                annotations=bar_spans if show_char_brackets else None,
-                width=SVG_WIDTH,
-                height=SVG_HEIGHT,
-            )
-            svg_rows.append(f'<div class="svg-row">{svg}</div>')
-            svg_list.append(svg)
+        if plan["degradations"]:
+            st.info(degradation_notice(plan, full_bar_count))
+        # Keyed on the parsed text so a long paste is not tokenized again
+        score_params = {
+            "text": audio_text,
+            "time_sig": time_sig,
+            "show_inactive_labels": plan["show_inactive_labels"],
+            "show_char_brackets": plan["show_char_brackets"],
+            "max_bars": plan["max_bars"],
+            "width": SVG_WIDTH,
+            "height": SVG_HEIGHT,
+            "row_gap": SVG_ROW_GAP,
+        }
+        score_svg = cache.get_or_create(
+            "score",
+            score_params,
+            lambda: render_score(
+                bars,
+                spans,
+                meter,
+                plan["show_inactive_labels"],
+                plan["show_char_brackets"],
+            ).encode("utf-8"),
+        ).decode("utf-8")
         st.markdown(
-            f'<div class="svg-frame">{"".join(svg_rows)}</div>',
+            f'<div class="svg-frame"><div class="svg-score">{score_svg}</div></div>',
             unsafe_allow_html=True,
         )
         
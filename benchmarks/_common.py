@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Scripts run as `python benchmarks/<name>.py`; put the repo modules on the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from morse import MORSE_DICT
+
+
+def random_text(rng, length, spaces=6):
+    # `length` characters drawn from every Morse symbol plus `spaces` spaces
+    symbols = list(MORSE_DICT) + [" "] * spaces
+    return "".join(rng.choice(symbols) for _ in range(length))
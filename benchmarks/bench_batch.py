@@ -0,0 +1,53 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from _common import random_text
+
+from components import batch_rows, build_morse_metronome_batch, build_morse_metronome_wave
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs looped multi-message synthesis")
+    parser.add_argument("--bpm", type=int, default=120)
+    parser.add_argument("--time-sig", default="4/4")
+    parser.add_argument("--length", type=int, default=12, help="characters per message")
+    parser.add_argument("--no-metronome", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    metronome = not args.no_metronome
+    print(f"{'messages':>9} {'loop ms':>9} {'batch ms':>9} {'speedup':>8} {'msg/s':>9}")
+    for count in (1, 10, 100, 1000):
+        texts = [random_text(rng, rng.randint(1, args.length)) for _ in range(count)]
+
+        loop_s = batch_s = float("inf")
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            looped = [
+                build_morse_metronome_wave(
+                    text, args.bpm, time_sig=args.time_sig, metronome_enabled=metronome
+                )[0]
+                for text in texts
+            ]
+            loop_s = min(loop_s, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            audio, lengths, _ = build_morse_metronome_batch(
+                texts, args.bpm, time_sig=args.time_sig, metronome_enabled=metronome
+            )
+            batch_s = min(batch_s, time.perf_counter() - start)
+
+        for expected, row in zip(looped, batch_rows(audio, lengths)):
+            assert np.array_equal(expected, row)
+        print(
+            f"{count:>9} {loop_s * 1000:9.1f} {batch_s * 1000:9.1f} "
+            f"{loop_s / batch_s:7.1f}x {count / batch_s:9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import random
+import sys
+import tempfile
+import time
+
+from _common import random_text
+
+from components import build_morse_metronome_wave, wav_bytes_from_audio, wav_cache_params
+from disk_cache import DiskCache
+from meters import get_meter
+from midi import midi_bytes_from_events
+from morse import text_to_morse, tokens_to_text
+from render_budget import plan_render
+from render_svg import render_score_svg
+from rhythm import (
+    annotations_for_bars,
+    events_to_steps,
+    morse_to_events_with_spans,
+    split_into_bars,
+    token_step_count,
+    truncate_events,
+    truncate_tokens,
+)
+
+
+def rerun(text, meter, bpm, budget_s, cache):
+    # The app's per-rerun work with a render plan applied, timed in parts,
+    # including its disk cache calls (all misses on a fresh cache)
+    timings = {}
+    start = time.perf_counter()
+    tokens = text_to_morse(text)
+    step_count = token_step_count(tokens, unit_scale=meter.unit_scale)
+    plan = plan_render(step_count, meter, bpm, budget_s, text_length=len(text))
+    timings["tokenize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    max_units = None
+    if plan["max_bars"] is not None:
+        max_steps = plan["max_bars"] * meter.bar_units
+        max_units = max_steps * meter.audio_units_per_step
+        tokens = truncate_tokens(tokens, max_steps, unit_scale=meter.unit_scale)
+        text = tokens_to_text(tokens)
+    parsed = cache.get_or_create_json(
+        "events",
+        {"text": text, "unit_scale": meter.unit_scale},
+        lambda: dict(
+            zip(
+                ("events", "spans"),
+                morse_to_events_with_spans(tokens, unit_scale=meter.unit_scale),
+            )
+        ),
+    )
+    events, spans = parsed["events"], parsed["spans"]
+    steps = events_to_steps(events)
+    bars = split_into_bars(steps, meter.bar_units)
+    midi_events, midi_spans = events, spans
+    if plan["max_bars"] is not None:
+        bars = bars[: plan["max_bars"]]
+        midi_events, midi_spans = truncate_events(events, spans, max_steps)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    def render_wav():
+        audio, sample_rate = build_morse_metronome_wave(
+            text, bpm, time_sig=meter.time_sig, sample_rate=plan["sample_rate"], max_units=max_units
+        )
+        return wav_bytes_from_audio(audio, sample_rate)
+
+    cache.get_or_create(
+        "wav",
+        wav_cache_params(
+            text, bpm, time_sig=meter.time_sig, sample_rate=plan["sample_rate"], max_units=max_units
+        ),
+        render_wav,
+    )
+    timings["audio"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    def render_score():
+        annotations = None
+        if plan["show_char_brackets"]:
+            annotations = annotations_for_bars(spans, len(bars), meter.bar_units)
+        return render_score_svg(
+            bars, meter, annotations=annotations, show_inactive_labels=plan["show_inactive_labels"]
+        ).encode("utf-8")
+
+    score_params = {
+        "text": text,
+        "time_sig": meter.time_sig,
+        "show_inactive_labels": plan["show_inactive_labels"],
+        "show_char_brackets": plan["show_char_brackets"],
+        "max_bars": plan["max_bars"],
+    }
+    cache.get_or_create("score", score_params, render_score)
+    timings["score"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    midi_bytes_from_events(midi_events, bpm, time_sig=meter.time_sig, spans=midi_spans)
+    timings["midi"] = time.perf_counter() - start
+    return plan, timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Render budget: estimate vs measured rerun time")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds")
+    parser.add_argument("--bpm", type=int, default=60)
+    parser.add_argument("--time-sig", default="4/4")
+    args = parser.parse_args()
+
+    meter = get_meter(args.time_sig)
+    rng = random.Random(0)
+    print(
+        f"{'chars':>7} {'estimate':>9} {'render':>7} {'total':>7} {'token':>6} {'parse':>6} {'midi':>6}"
+        "  degradations"
+    )
+    over = 0
+    for length in (10, 100, 1_000, 3_000, 10_000, 30_000, 100_000, 200_000):
+        with tempfile.TemporaryDirectory() as directory:
+            plan, timings = rerun(
+                random_text(rng, length), meter, args.bpm, args.budget, DiskCache(directory)
+            )
+        render_s = timings["audio"] + timings["score"]
+        total_s = sum(timings.values())
+        over += total_s > args.budget
+        print(
+            f"{length:>7} {plan['estimate_s']:9.3f} {render_s:7.3f} {total_s:7.3f} "
+            f"{timings['tokenize']:6.3f} {timings['parse']:6.3f} {timings['midi']:6.3f}"
+            f"  {','.join(plan['degradations']) or '-'}"
+        )
+    print(f"{over} rerun(s) over the {args.budget:g}s budget")
+    if over:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import random
+import sys
+import time
+
+import _common  # puts the repo modules on sys.path
+
+from components import build_morse_metronome_wave, morse_grid
+from decoder import decode_audio, grid_reads_as, grid_to_text, verify_round_trip
+from meters import TIME_SIGNATURES
+from morse import MORSE_DICT, text_to_morse
+
+
+def random_text(rng):
+    symbols = list(MORSE_DICT)
+    words = []
+    for _ in range(rng.randint(1, 4)):
+        words.append("".join(rng.choice(symbols) for _ in range(rng.randint(1, 6))))
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render/decode round trips across meters and tempos")
+    parser.add_argument("--cases", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--blind", action="store_true", help="decode without bpm/time_sig")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [
+        (
+            random_text(rng),
+            rng.randrange(60, 181, 5),
+            rng.choice(TIME_SIGNATURES),
+            rng.random() < 0.8,
+        )
+        for _ in range(args.cases)
+    ]
+    renders = [
+        (text, bpm, time_sig, build_morse_metronome_wave(
+            text, bpm, time_sig=time_sig, metronome_enabled=metronome
+        ))
+        for text, bpm, time_sig, metronome in cases
+    ]
+
+    failures = []
+    start = time.perf_counter()
+    for text, bpm, time_sig, (audio, sample_rate) in renders:
+        if args.blind:
+            decoded = decode_audio(audio, sample_rate)
+            # Audio is ambiguous for some texts, so compare canonical parses
+            expected = grid_to_text(morse_grid(text_to_morse(text)))
+            ok = decoded["text"] == expected and grid_reads_as(decoded["grid"], text)
+        else:
+            ok = verify_round_trip(text, audio, sample_rate, bpm=bpm, time_sig=time_sig)
+        if not ok:
+            failures.append((text, bpm, time_sig))
+    elapsed = time.perf_counter() - start
+
+    mode = "blind" if args.blind else "known params"
+    print(
+        f"{mode}: {len(renders)} decodes in {elapsed:.2f} s "
+        f"({len(renders) / elapsed * 60:,.0f}/min), {len(failures)} failures"
+    )
+    for failure in failures[:10]:
+        print("  FAIL", failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+
+import _common  # puts the repo modules on sys.path
+
+from components import build_morse_metronome_wave, wav_bytes_from_audio
+from meters import TIME_SIGNATURES, get_meter
+from midi import midi_bytes_from_events
+from morse import MORSE_DICT, text_to_morse
+from rhythm import morse_to_events_with_spans
+
+
+def random_phrase(rng, words=3):
+    letters = [ch for ch in MORSE_DICT if ch.isalpha()]
+    return " ".join(
+        "".join(rng.choice(letters) for _ in range(rng.randint(2, 7)))
+        for _ in range(words)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch MIDI export throughput")
+    parser.add_argument("--phrases", type=int, default=20000)
+    parser.add_argument("--bpm", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    jobs = [
+        (random_phrase(rng), rng.choice(TIME_SIGNATURES)) for _ in range(args.phrases)
+    ]
+
+    total_bytes = 0
+    start = time.perf_counter()
+    for text, time_sig in jobs:
+        meter = get_meter(time_sig)
+        events, spans = morse_to_events_with_spans(
+            text_to_morse(text), unit_scale=meter.unit_scale
+        )
+        total_bytes += len(
+            midi_bytes_from_events(events, args.bpm, time_sig=time_sig, spans=spans)
+        )
+    elapsed = time.perf_counter() - start
+    print(
+        f"midi: {args.phrases} phrases in {elapsed:.2f} s "
+        f"({args.phrases / elapsed * 60:,.0f}/min), "
+        f"avg {total_bytes / args.phrases:.0f} bytes"
+    )
+
+    sample = jobs[: min(200, len(jobs))]
+    wav_total = 0
+    start = time.perf_counter()
+    for text, time_sig in sample:
+        audio, sample_rate = build_morse_metronome_wave(text, args.bpm, time_sig=time_sig)
+        wav_total += len(wav_bytes_from_audio(audio, sample_rate))
+    elapsed = time.perf_counter() - start
+    print(
+        f" wav: {len(sample)} phrases in {elapsed:.2f} s "
+        f"({len(sample) / elapsed * 60:,.0f}/min), "
+        f"avg {wav_total / len(sample):,.0f} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from _common import random_text
+
+from meters import get_meter
+from morse import text_to_morse
+from render_svg import render_bars_svg
+from rhythm import annotations_for_bars, events_to_steps, morse_to_events_with_spans, split_into_bars
+
+
+def score(rng, meter, bar_count):
+    bars = []
+    while len(bars) < bar_count:
+        text = random_text(rng, 200)
+        events, spans = morse_to_events_with_spans(text_to_morse(text), unit_scale=meter.unit_scale)
+        chunk = split_into_bars(events_to_steps(events), meter.bar_units)
+        bars.extend(zip(chunk, annotations_for_bars(spans, len(chunk), meter.bar_units)))
+    bars = bars[:bar_count]
+    return [bar for bar, _ in bars], [ann for _, ann in bars]
+
+
+def timed(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-bar SVG rendering: serial vs worker pools")
+    parser.add_argument("--time-sig", default="4/4")
+    parser.add_argument("--executor", choices=("process", "thread"), default="process")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    meter = get_meter(args.time_sig)
+    rng = random.Random(0)
+    worker_counts = (1, 2, 4, 8)
+    print(f"cpus: {os.cpu_count()}  executor: {args.executor}  (speedup vs serial; pooled = reused pool)")
+    print(f"{'bars':>6} {'serial ms':>10} " + " ".join(f"{f'w={w}':>7} {'pooled':>7}" for w in worker_counts))
+    for bar_count in (32, 128, 512, 2048, 8192):
+        bars, annotations = score(rng, meter, bar_count)
+        options = {"annotations": annotations, "compact": args.compact}
+        serial_s, expected = timed(
+            lambda: render_bars_svg(bars, meter, executor="serial", **options), args.repeats
+        )
+        cells = []
+        for workers in worker_counts:
+            # Fresh pool per call, as a one-off caller would see it
+            fresh_s, svgs = timed(
+                lambda: render_bars_svg(
+                    bars, meter, executor=args.executor, workers=workers, min_parallel_bars=0, **options
+                ),
+                args.repeats,
+            )
+            assert svgs == expected
+            pooled = "-"
+            if args.executor == "process":
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    pool.submit(int).result()
+                    pooled_s, svgs = timed(
+                        lambda: render_bars_svg(
+                            bars, meter, executor=pool, workers=workers, min_parallel_bars=0, **options
+                        ),
+                        args.repeats,
+                    )
+                assert svgs == expected
+                pooled = f"{serial_s / pooled_s:6.2f}x"
+            cells.append(f"{serial_s / fresh_s:6.2f}x {pooled:>7}")
+        print(f"{bar_count:>6} {serial_s * 1000:10.1f} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
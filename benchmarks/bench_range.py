@@ -0,0 +1,90 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from _common import random_text
+
+from components import (
+    bar_unit_range,
+    build_morse_metronome_wave,
+    build_morse_range_wave,
+    span_unit_range,
+    unit_samples_for,
+)
+from meters import TIME_SIGNATURES, get_meter
+from morse import text_to_morse
+from rhythm import events_to_steps, morse_to_events_with_spans, split_into_bars
+
+
+def check_alignment(text, bpm, time_sig, metronome, start, end, loops, sample_rate):
+    # The range, with and without count-in and loops, must equal the same
+    # samples of the full render
+    meter = get_meter(time_sig)
+    full, _ = build_morse_metronome_wave(
+        text, bpm, time_sig=time_sig, metronome_enabled=metronome, sample_rate=sample_rate
+    )
+    unit = unit_samples_for(bpm, sample_rate)
+    options = {"time_sig": time_sig, "metronome_enabled": metronome, "sample_rate": sample_rate}
+    once, _ = build_morse_range_wave(text, bpm, start_unit=start, end_unit=end, count_in=False, **options)
+    offset = (meter.count_in_units + start) * unit
+    overlap = full[offset : offset + once.size]
+    assert np.array_equal(once[: overlap.size], overlap), (text, bpm, time_sig, start, end)
+    # Past the message end only metronome clicks remain
+    assert set(np.unique(once[overlap.size :])) <= set(np.unique(full[: meter.count_in_units * unit]))
+
+    looped, _ = build_morse_range_wave(
+        text, bpm, start_unit=start, end_unit=end, count_in=True, loops=loops, **options
+    )
+    lead = meter.count_in_units * unit
+    assert looped.size == lead + loops * once.size
+    assert np.array_equal(looped[lead:], np.tile(once, loops))
+    if metronome and start % meter.click_units == 0:
+        # On the beat, the count-in is the full render's count-in
+        assert np.array_equal(looped[:lead], full[:lead])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Range audio: alignment with the full render and cost")
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for _ in range(args.cases):
+        text = random_text(rng, rng.randint(1, 40)).strip() or "E"
+        time_sig = rng.choice(TIME_SIGNATURES)
+        meter = get_meter(time_sig)
+        bpm = rng.randrange(60, 181, 5)
+        metronome = rng.random() < 0.8
+        sample_rate = rng.choice((44100, 22050, 11025))
+        events, spans = morse_to_events_with_spans(text_to_morse(text), unit_scale=meter.unit_scale)
+        bar_count = len(split_into_bars(events_to_steps(events), meter.bar_units))
+        if rng.random() < 0.5:
+            first = rng.randrange(bar_count)
+            start, end = bar_unit_range(meter, first, rng.randint(first + 1, bar_count))
+        else:
+            first = rng.randrange(len(spans))
+            start, end = span_unit_range(meter, spans, first, rng.randrange(first, len(spans)))
+        check_alignment(text, bpm, time_sig, metronome, start, end, rng.randint(1, 4), sample_rate)
+    print(f"{args.cases} ranges sample-aligned with the full render")
+
+    meter = get_meter("4/4")
+    print(f"{'chars':>7} {'bars':>6} {'full ms':>9} {'last bar ms':>12}")
+    for length in (100, 1_000, 5_000):
+        text = random_text(rng, length).strip() or "E"
+        events, _ = morse_to_events_with_spans(text_to_morse(text))
+        bar_count = len(split_into_bars(events_to_steps(events), meter.bar_units))
+        start = time.perf_counter()
+        build_morse_metronome_wave(text, 120)
+        full_s = time.perf_counter() - start
+        start = time.perf_counter()
+        first, last = bar_unit_range(meter, bar_count - 1, bar_count)
+        build_morse_range_wave(text, 120, start_unit=first, end_unit=last)
+        range_s = time.perf_counter() - start
+        print(f"{length:>7} {bar_count:>6} {full_s * 1000:9.1f} {range_s * 1000:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
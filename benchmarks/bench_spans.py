@@ -0,0 +1,64 @@
+import argparse
+import random
+import time
+
+from _common import random_text
+
+from meters import get_meter
+from morse import text_to_morse
+from rhythm import SpanIndex, events_to_steps, morse_to_events_with_spans, split_into_bars
+
+
+def scan_annotations(spans, bar_count, bar_units):
+    # Previous approach: every bar scans every span
+    annotations = []
+    for idx in range(bar_count):
+        bar_start = idx * bar_units
+        bar_end = bar_start + bar_units - 1
+        annotations.append(
+            [
+                {
+                    "start": span["start"] - bar_start,
+                    "end": span["end"] - bar_start,
+                    "label": span["label"],
+                }
+                for span in spans
+                if not (span["end"] < bar_start or span["start"] > bar_end)
+            ]
+        )
+    return annotations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Span-to-bar bucketing scaling")
+    parser.add_argument("--time-sig", default="4/4")
+    parser.add_argument("--scan-limit", type=int, default=10_000, help="largest size to run the scan on")
+    args = parser.parse_args()
+
+    meter = get_meter(args.time_sig)
+    rng = random.Random(0)
+    print(f"{'chars':>8} {'bars':>7} {'index ms':>9} {'ns/char':>8} {'scan ms':>9}")
+    for length in (1_000, 10_000, 100_000):
+        events, spans = morse_to_events_with_spans(
+            text_to_morse(random_text(rng, length, spaces=8)), unit_scale=meter.unit_scale
+        )
+        bar_count = len(split_into_bars(events_to_steps(events), meter.bar_units))
+
+        start = time.perf_counter()
+        indexed = SpanIndex(spans, meter.bar_units).for_bars(bar_count)
+        index_s = time.perf_counter() - start
+
+        scan = "-"
+        if length <= args.scan_limit:
+            start = time.perf_counter()
+            scanned = scan_annotations(spans, bar_count, meter.bar_units)
+            scan = f"{(time.perf_counter() - start) * 1000:9.1f}"
+            assert scanned == indexed
+        print(
+            f"{length:>8} {bar_count:>7} {index_s * 1000:9.1f} "
+            f"{index_s * 1e9 / length:8.0f} {scan:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import time
+
+import _common  # puts the repo modules on sys.path
+
+from meters import get_meter
+from morse import text_to_morse
+from render_svg import render_bar_svg, render_score_svg, svg_stats
+from rhythm import events_to_steps, morse_to_events_with_spans, split_into_bars
+
+
+TEXT = "the quick brown fox jumps over the lazy dog 0123456789"
+
+
+def bar_annotations(spans, bar_index, bar_units):
+    bar_start = bar_index * bar_units
+    bar_end = bar_start + bar_units - 1
+    return [
+        {
+            "start": span["start"] - bar_start,
+            "end": span["end"] - bar_start,
+            "label": span["label"],
+        }
+        for span in spans
+        if not (span["end"] < bar_start or span["start"] > bar_end)
+    ]
+
+
+def render_all(bars, spans, meter, compact):
+    last_index = len(bars) - 1
+    return [
+        render_bar_svg(
+            bar_steps,
+            meter,
+            is_last_bar=idx == last_index,
+            annotations=bar_annotations(spans, idx, meter.bar_units),
+            compact=compact,
+        )
+        for idx, bar_steps in enumerate(bars)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SVG payload size per emitter mode")
+    parser.add_argument("--text", default=TEXT)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--time-sig", default="4/4")
+    parser.add_argument("--per-bar", action="store_true")
+    args = parser.parse_args()
+
+    meter = get_meter(args.time_sig)
+    events, spans = morse_to_events_with_spans(
+        text_to_morse(" ".join([args.text] * args.repeat)), unit_scale=meter.unit_scale
+    )
+    bars = split_into_bars(events_to_steps(events), meter.bar_units)
+
+    results = {}
+    for compact in (False, True):
+        start = time.perf_counter()
+        svgs = render_all(bars, spans, meter, compact)
+        elapsed = time.perf_counter() - start
+        results[compact] = ([svg_stats(svg) for svg in svgs], elapsed)
+
+    if args.per_bar:
+        print(f"{'bar':>4} {'bytes':>8} {'compact':>8} {'elems':>6} {'compact':>8}")
+        for idx, (full, compact) in enumerate(zip(results[False][0], results[True][0])):
+            print(
+                f"{idx + 1:>4} {full['bytes']:>8} {compact['bytes']:>8} "
+                f"{full['elements']:>6} {compact['elements']:>8}"
+            )
+
+    for compact, label in ((False, "elements"), (True, "compact")):
+        stats, elapsed = results[compact]
+        total_bytes = sum(item["bytes"] for item in stats)
+        total_elements = sum(item["elements"] for item in stats)
+        print(
+            f"{label:>8}: {len(stats)} bars, {total_bytes} bytes, "
+            f"{total_elements} elements, {elapsed * 1000:.1f} ms"
+        )
+    # The app and service sent compact per-bar SVGs before the score document
+    per_bar = results[True][0]
+    per_bar_bytes = sum(item["bytes"] for item in per_bar)
+    per_bar_elements = sum(item["elements"] for item in per_bar)
+
+    annotations = [
+        bar_annotations(spans, idx, meter.bar_units) for idx in range(len(bars))
+    ]
+    start = time.perf_counter()
+    score = render_score_svg(bars, meter, annotations=annotations)
+    elapsed = time.perf_counter() - start
+    stats = svg_stats(score)
+    print(
+        f"{'score':>8}: 1 document, {stats['bytes']} bytes, "
+        f"{stats['elements']} elements, {elapsed * 1000:.1f} ms"
+    )
+    print(
+        f"{'':>8}  vs compact per-bar: {per_bar_bytes / max(stats['bytes'], 1):.2f}x fewer bytes, "
+        f"{per_bar_elements / max(stats['elements'], 1):.2f}x fewer elements"
+    )
+
+
+if __name__ == "__main__":
+    main()
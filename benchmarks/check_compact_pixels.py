@@ -0,0 +1,71 @@
+import argparse
+import io
+import random
+import sys
+
+import numpy as np
+
+from _common import random_text
+
+from meters import TIME_SIGNATURES, get_meter
+from morse import text_to_morse
+from render_svg import COORD_PRECISION, render_bar_svg
+from rhythm import annotations_for_bars, events_to_steps, morse_to_events_with_spans, split_into_bars
+
+try:
+    import resvg_py
+    from PIL import Image
+except ImportError:
+    sys.exit("needs resvg-py and pillow: pip install resvg-py pillow")
+
+
+def raster(svg):
+    png = resvg_py.svg_to_bytes(svg_string=svg, background="#ffffff")
+    return np.asarray(Image.open(io.BytesIO(png)).convert("RGBA")).astype(np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rasterize element and compact bars in every meter and compare pixels"
+    )
+    parser.add_argument("--texts", type=int, default=8, help="random texts per meter")
+    parser.add_argument("--precision", type=int, default=COORD_PRECISION)
+    parser.add_argument("--exact", action="store_true", help="write coordinates at full precision")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failed = 0
+    for time_sig in TIME_SIGNATURES:
+        meter = get_meter(time_sig)
+        checked = differing = worst = 0
+        for _ in range(args.texts):
+            text = random_text(rng, rng.randint(1, 24))
+            events, spans = morse_to_events_with_spans(
+                text_to_morse(text), unit_scale=meter.unit_scale
+            )
+            bars = split_into_bars(events_to_steps(events), meter.bar_units)
+            annotations = annotations_for_bars(spans, len(bars), meter.bar_units)
+            for idx, bar_steps in enumerate(bars):
+                options = {
+                    "is_last_bar": idx == len(bars) - 1,
+                    "annotations": annotations[idx],
+                    "show_inactive_labels": rng.random() < 0.7,
+                }
+                element = render_bar_svg(bar_steps, meter, **options)
+                if not element:
+                    continue
+                compact = render_bar_svg(
+                    bar_steps, meter, compact=True, precision=None if args.exact else args.precision, **options
+                )
+                diff = int(np.abs(raster(element) - raster(compact)).max())
+                checked += 1
+                differing += diff > 0
+                worst = max(worst, diff)
+        failed += differing
+        print(f"{time_sig:>5}: {checked:>4} bars, {differing:>3} differ, max diff {worst}/255")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
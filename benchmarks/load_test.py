@@ -0,0 +1,107 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import _common  # puts the repo modules on sys.path
+
+from meters import TIME_SIGNATURES
+from server import make_server
+
+
+PHRASES = ["sos", "hello world", "cq cq de k1abc", "the quick brown fox", "morse rhythm"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def worker(host, port, kind, jobs, latencies, statuses, lock):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    for payload in jobs:
+        body = json.dumps(payload)
+        start = time.perf_counter()
+        try:
+            conn.request("POST", f"/render/{kind}", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            status = "error"
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the render service")
+    parser.add_argument("--url", help="running service, e.g. http://127.0.0.1:8502")
+    parser.add_argument("--kind", default="score", choices=("bars", "score", "wav", "midi", "events"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--unique", type=float, default=0.2, help="fraction of uncached inputs")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--executor", choices=("process", "thread"), default="process")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    httpd = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        httpd = make_server("127.0.0.1", 0, workers=args.workers, executor=args.executor)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        host, port = httpd.server_address[:2]
+
+    rng = random.Random(args.seed)
+    jobs = []
+    for i in range(args.requests):
+        text = rng.choice(PHRASES)
+        if rng.random() < args.unique:
+            text = f"{text} {i}"
+        jobs.append(
+            {"text": text, "time_sig": rng.choice(TIME_SIGNATURES), "bpm": rng.choice((60, 90, 120))}
+        )
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(host, port, args.kind, jobs[i :: args.concurrency], latencies, statuses, lock),
+        )
+        for i in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(latencies)} requests in {elapsed:.2f} s: {len(latencies) / elapsed:.0f} req/s, "
+        f"p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, statuses {statuses}"
+    )
+
+    if httpd is not None:
+        httpd.shutdown()
+        httpd.server_close()
+        httpd.service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from io import BytesIO
 
 import numpy as np
 
+from meters import get_meter
 from morse import text_to_morse
 
 
@@ -14,7 +15,48 @@ def _sine_wave(freq_hz, duration_s, sample_rate):
     return np.sin(2 * np.pi * freq_hz * t)
 
 
-def _morse_grid(tokens):
+def _unit_tone(freq_hz, unit_duration, unit_samples, sample_rate):
+    # One synth unit of Morse tone, exactly unit_samples long
+    tone = _sine_wave(freq_hz, unit_duration, sample_rate)
+    if len(tone) != unit_samples:
+        tone = tone[:unit_samples]
+        if len(tone) < unit_samples:
+            tone = np.pad(tone, (0, unit_samples - len(tone)))
+    return tone.astype(np.float32)
+
+
+def _unit_click(freq_hz, unit_samples, sample_rate):
+    # Short metronome click at the start of a silent unit
+    click_samples = max(1, min(int(unit_samples * 0.25), int(sample_rate * 0.03)))
+    click = np.zeros(unit_samples, dtype=np.float32)
+    click_wave = _sine_wave(freq_hz, click_samples / sample_rate, sample_rate)
+    if len(click_wave) != click_samples:
+        click_wave = click_wave[:click_samples]
+        if len(click_wave) < click_samples:
+            click_wave = np.pad(click_wave, (0, click_samples - len(click_wave)))
+    click[:click_samples] = click_wave
+    return click
+
+
+def _unit_patterns(tone, click):
+    # Every unit is silence (0), tone (1), click (2) or tone plus click (3)
+    silence = np.zeros(len(tone), dtype=np.float32)
+    return np.stack([silence, tone, click, tone + click])
+
+
+def _normalized_units(patterns, peak):
+    # int16 units exactly as a full render normalized to `peak` writes them
+    if peak <= 0:
+        return np.zeros(patterns.shape, dtype=np.int16)
+    return (patterns / peak * 0.9 * 32767).astype(np.int16)
+
+
+def unit_samples_for(bpm, sample_rate):
+    # Samples per synth unit (an eighth of a beat)
+    return int(sample_rate * (7.5 / bpm))
+
+
+def morse_grid(tokens):
     grid = []
     for i, token in enumerate(tokens):
         if token["type"] != "letter":
@@ -46,32 +88,27 @@ def build_morse_metronome_wave(
     sample_rate=44100,
     morse_freq=620,
     click_freq=1400,
+    max_units=None,
 ):
     tokens = text_to_morse(text)
-    grid = _morse_grid(tokens)
+    grid = morse_grid(tokens)
+    if max_units is not None:
+        # Only the first max_units units after the count-in are rendered
+        grid = grid[:max_units]
     if not grid:
         return np.zeros(0, dtype=np.int16), sample_rate
 
     unit_duration = 7.5 / bpm
-    unit_samples = int(sample_rate * unit_duration)
+    unit_samples = unit_samples_for(bpm, sample_rate)
     if unit_samples <= 0:
         return np.zeros(0, dtype=np.int16), sample_rate
 
-    numerator, denominator = (int(part) for part in time_sig.split("/"))
-    group_units = 8
-    groups_per_bar = numerator
-    if denominator == 8:
-        group_units = 6
-        groups_per_bar = max(numerator // 3, 1)
-    count_in_units = group_units * groups_per_bar
+    meter = get_meter(time_sig)
+    count_in_units = meter.count_in_units
 
     total_samples = unit_samples * (count_in_units + len(grid))
     morse_layer = np.zeros(total_samples, dtype=np.float32)
-    tone = _sine_wave(morse_freq, unit_duration, sample_rate)
-    if len(tone) != unit_samples:
-        tone = tone[:unit_samples]
-        if len(tone) < unit_samples:
-            tone = np.pad(tone, (0, unit_samples - len(tone)))
+    tone = _unit_tone(morse_freq, unit_duration, unit_samples, sample_rate)
 
     morse_offset = count_in_units * unit_samples
     for i, active in enumerate(grid):
@@ -83,21 +120,13 @@ def build_morse_metronome_wave(
     mix = morse_layer
 
     if metronome_enabled:
-        click_samples = max(1, min(int(unit_samples * 0.25), int(sample_rate * 0.03)))
-        click = np.zeros(unit_samples, dtype=np.float32)
-        click_wave = _sine_wave(click_freq, click_samples / sample_rate, sample_rate)
-        if len(click_wave) != click_samples:
-            click_wave = click_wave[:click_samples]
-            if len(click_wave) < click_samples:
-                click_wave = np.pad(
-                    click_wave, (0, click_samples - len(click_wave))
-                )
-        click[:click_samples] = click_wave
+        click = _unit_click(click_freq, unit_samples, sample_rate)
 
         metronome_layer = np.zeros(total_samples, dtype=np.float32)
         total_units = count_in_units + len(grid)
         for i in range(total_units):
-            if i % group_units != 0:
+            # The count-in is one bar of clicks, so it is also the click cycle
+            if i % count_in_units not in meter.click_grid:
                 continue
             start = i * unit_samples
             metronome_layer[start : start + unit_samples] += click
@@ -112,6 +141,166 @@ def build_morse_metronome_wave(
     return audio, sample_rate
 
 
+def wav_cache_params(
+    text,
+    bpm,
+    time_sig="4/4",
+    metronome_enabled=True,
+    sample_rate=44100,
+    max_units=None,
+    morse_freq=620,
+    click_freq=1400,
+):
+    # DiskCache params of a build_morse_metronome_wave render stored as "wav"
+    return {
+        "text": text,
+        "bpm": bpm,
+        "time_sig": time_sig,
+        "metronome": metronome_enabled,
+        "sample_rate": sample_rate,
+        "max_units": max_units,
+        "morse_freq": morse_freq,
+        "click_freq": click_freq,
+    }
+
+
+def build_morse_metronome_batch(
+    texts,
+    bpm,
+    time_sig="4/4",
+    metronome_enabled=True,
+    sample_rate=44100,
+    morse_freq=620,
+    click_freq=1400,
+):
+    # Many messages at one tempo and meter in one (messages, samples) int16
+    # matrix. Rows are zero-padded to the longest message and match
+    # build_morse_metronome_wave sample for sample up to their length
+    # (0 for texts with no Morse). There is no disk cache lookup here:
+    # reading a row's WAV back costs more than synthesizing it.
+    grids = [morse_grid(text_to_morse(text)) for text in texts]
+    count = len(grids)
+    unit_duration = 7.5 / bpm
+    unit_samples = unit_samples_for(bpm, sample_rate)
+    lengths = np.zeros(count, dtype=np.int64)
+    if not count or unit_samples <= 0 or not any(grids):
+        return np.zeros((count, 0), dtype=np.int16), lengths, sample_rate
+
+    meter = get_meter(time_sig)
+    count_in_units = meter.count_in_units
+    grid_units = np.array([len(grid) for grid in grids], dtype=np.int64)
+    total_units = np.where(grid_units > 0, count_in_units + grid_units, 0)
+    max_units = int(total_units.max())
+    lengths[:] = total_units * unit_samples
+
+    codes = np.zeros((count, max_units), dtype=np.intp)
+    for row, grid in enumerate(grids):
+        if grid:
+            codes[row, count_in_units : count_in_units + len(grid)] = grid
+    tone = _unit_tone(morse_freq, unit_duration, unit_samples, sample_rate)
+    click = np.zeros(unit_samples, dtype=np.float32)
+    if metronome_enabled:
+        click = _unit_click(click_freq, unit_samples, sample_rate)
+        unit_index = np.arange(max_units)
+        codes += 2 * (
+            np.isin(unit_index % count_in_units, meter.click_grid)
+            & (unit_index < total_units[:, None])
+        )
+    patterns = _unit_patterns(tone, click)
+
+    # A row's peak is the loudest pattern it uses, so the normalized int16
+    # units come from a table with one entry per (peak, pattern) pair
+    pattern_peaks = np.abs(patterns).max(axis=1)
+    peaks, peak_ids = np.unique(pattern_peaks[codes].max(axis=1), return_inverse=True)
+    table = np.stack([_normalized_units(patterns, peak) for peak in peaks])
+    audio = table.reshape(-1, unit_samples)[peak_ids.reshape(-1, 1) * 4 + codes]
+    return audio.reshape(count, max_units * unit_samples), lengths, sample_rate
+
+
+def bar_unit_range(meter, start_bar, end_bar):
+    # Message units (after the count-in) covered by bars [start_bar, end_bar)
+    per_bar = meter.bar_units * meter.audio_units_per_step
+    return start_bar * per_bar, end_bar * per_bar
+
+
+def span_unit_range(meter, spans, first, last):
+    # Message units from character `first` up to where the character after
+    # `last` starts, so the trailing gap is kept; None runs to the end
+    if not 0 <= first <= last < len(spans):
+        raise ValueError(f"character range {first}-{last} outside {len(spans)} spans")
+    start = spans[first]["start"] * meter.audio_units_per_step
+    end = None
+    if last + 1 < len(spans):
+        end = spans[last + 1]["start"] * meter.audio_units_per_step
+    return start, end
+
+
+def build_morse_range_wave(
+    text,
+    bpm,
+    time_sig="4/4",
+    start_unit=0,
+    end_unit=None,
+    count_in=True,
+    loops=1,
+    metronome_enabled=True,
+    sample_rate=44100,
+    morse_freq=620,
+    click_freq=1400,
+):
+    # Audio for message units [start_unit, end_unit), sample for sample what
+    # build_morse_metronome_wave writes there: same unit grid, same clicks
+    # and the whole message's peak. Units past the message end are silence
+    # with the metronome still running. count_in prepends a count-in bar and
+    # loops repeats the range back to back; cost follows the range length.
+    grid = morse_grid(text_to_morse(text))
+    unit_duration = 7.5 / bpm
+    unit_samples = unit_samples_for(bpm, sample_rate)
+    start_unit = max(start_unit, 0)
+    end_unit = len(grid) if end_unit is None else end_unit
+    if not grid or unit_samples <= 0 or end_unit <= start_unit or loops < 1:
+        return np.zeros(0, dtype=np.int16), sample_rate
+
+    meter = get_meter(time_sig)
+    count_in_units = meter.count_in_units
+    grid = np.asarray(grid, dtype=np.intp)
+    tone = _unit_tone(morse_freq, unit_duration, unit_samples, sample_rate)
+    click = np.zeros(unit_samples, dtype=np.float32)
+    if metronome_enabled:
+        click = _unit_click(click_freq, unit_samples, sample_rate)
+    patterns = _unit_patterns(tone, click)
+
+    def clicks_at(units):
+        # Clicks follow the full render's unit index, count-in included
+        return 2 * (np.isin(units % count_in_units, meter.click_grid) & metronome_enabled)
+
+    # The full render's peak is the loudest pattern anywhere in it
+    message_units = np.arange(count_in_units, count_in_units + len(grid))
+    used = np.concatenate([clicks_at(np.arange(count_in_units)), grid + clicks_at(message_units)])
+    peak = np.abs(patterns).max(axis=1)[used].max()
+    table = _normalized_units(patterns, peak)
+
+    units = np.arange(count_in_units + start_unit, count_in_units + end_unit)
+    tones = np.zeros(len(units), dtype=np.intp)
+    inside = units < count_in_units + len(grid)
+    tones[inside] = grid[units[inside] - count_in_units]
+    codes = np.tile(tones + clicks_at(units), loops)
+    if count_in:
+        # Clicks only, ending where the range starts so the beat carries on
+        lead = np.arange(units[0] - count_in_units, units[0])
+        codes = np.concatenate([clicks_at(lead), codes])
+    return table[codes].reshape(-1), sample_rate
+
+
+def batch_rows(audio, lengths):
+    # Per-message views into a batch matrix, trimmed to each row's length
+    return [audio[row, :length] for row, length in enumerate(lengths)]
+
+
+def wav_bytes_from_batch(audio, lengths, sample_rate):
+    return [wav_bytes_from_audio(row, sample_rate) for row in batch_rows(audio, lengths)]
+
+
 def wav_bytes_from_audio(audio, sample_rate):
     if audio.size == 0:
         return b""
@@ -0,0 +1,259 @@
+import math
+import wave
+from io import BytesIO
+
+import numpy as np
+
+from components import morse_grid, unit_samples_for
+from meters import get_meter
+from morse import MORSE_DICT, MORSE_TO_CHAR, canonical_text, text_to_morse
+
+
+# Tone power above this fraction of the loudest unit counts as "on"
+ON_THRESHOLD = 0.25
+# Short analysis frames used only to estimate the unit length
+PROBE_FRAME = 128
+PROBE_HOP = 32
+
+# Zeros after a tone -> (symbol, what follows). The synth plays a dash as a
+# one-unit tone plus two silent units, so a 3-unit gap is either a dash
+# inside a letter or a dot that ends the letter.
+_GAP_OPTIONS = {
+    1: ((".", None),),
+    3: (("-", None), (".", "")),
+    5: (("-", ""),),
+    7: ((".", " "),),
+    9: (("-", " "),),
+}
+_FINAL_GAP_OPTIONS = {
+    0: ((".", ""),),
+    2: (("-", ""),),
+    7: ((".", " "),),
+    9: (("-", " "),),
+}
+_PREFIXES = {pattern[:i] for pattern in MORSE_TO_CHAR for i in range(1, len(pattern) + 1)}
+
+# English letter frequencies (%), used to pick the likeliest reading of
+# ambiguous audio; digits and punctuation share a small default
+LETTER_FREQUENCY = {
+    "E": 12.7, "T": 9.1, "A": 8.2, "O": 7.5, "I": 7.0, "N": 6.7, "S": 6.3,
+    "H": 6.1, "R": 6.0, "D": 4.3, "L": 4.0, "C": 2.8, "U": 2.8, "M": 2.4,
+    "W": 2.4, "F": 2.2, "G": 2.0, "Y": 2.0, "P": 1.9, "B": 1.5, "V": 1.0,
+    "K": 0.8, "J": 0.15, "X": 0.15, "Q": 0.1, "Z": 0.07,
+}
+_CHAR_COST = {
+    ch: -math.log(LETTER_FREQUENCY.get(ch, 0.05) / 100) for ch in MORSE_TO_CHAR.values()
+}
+
+
+def read_wav(source):
+    # Path, file object or WAV bytes -> (int16 samples, sample_rate)
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    with wave.open(source, "rb") as wf:
+        sample_rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    return np.frombuffer(frames, dtype=np.int16), sample_rate
+
+
+def tone_power(frames, freq_hz, sample_rate):
+    # Single-bin DFT (Goertzel response) of every row of `frames` at freq_hz
+    t = np.arange(frames.shape[1], dtype=np.float32) / np.float32(sample_rate)
+    phase = np.float32(2 * np.pi * freq_hz) * t
+    basis = np.stack([np.cos(phase), np.sin(phase)], axis=1)
+    projected = frames @ basis
+    return np.einsum("ij,ij->i", projected, projected)
+
+
+def _active(power, frame_len):
+    if not power.size:
+        return np.zeros(0, dtype=bool)
+    # Ignore near-silence so a tone-free render decodes as empty
+    floor = (0.01 * 32767 * frame_len / 2) ** 2
+    return power > max(power.max() * ON_THRESHOLD, floor)
+
+
+def _estimate_grid(samples, sample_rate, morse_freq):
+    # Unit length and first onset from short-frame tone detection. Every
+    # tone the synth writes is exactly one unit long.
+    if samples.size < PROBE_FRAME:
+        return None, None
+    frames = np.lib.stride_tricks.sliding_window_view(samples, PROBE_FRAME)[::PROBE_HOP]
+    on = _active(tone_power(frames, morse_freq, sample_rate), PROBE_FRAME)
+    edges = np.diff(on.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not starts.size:
+        return None, None
+
+    unit = float(np.median(ends - starts) * PROBE_HOP)
+    onsets = starts * PROBE_HOP + PROBE_FRAME / 2
+    first = onsets[0]
+    # Fit onsets to first + n * unit over a growing window so rounding
+    # to the nearest unit never slips
+    span = 16
+    while True:
+        window = onsets[onsets - first < span * unit]
+        counts = np.round((window - first) / unit)
+        if counts[-1] > 0:
+            unit, first = np.polyfit(counts, window, 1)
+        if window.size == onsets.size:
+            break
+        span *= 4
+
+    return _snap_unit(unit, samples.size, sample_rate), max(int(round(first)), 0)
+
+
+def _snap_unit(unit, total_samples, sample_rate):
+    # Prefer an integer-bpm unit that divides the audio length, since a
+    # full render is a whole number of units; with few tones the measured
+    # length is only about PROBE_HOP accurate at each edge. Otherwise snap
+    # only when close.
+    tolerance = max(unit * 0.005, 2 * PROBE_HOP)
+    candidates = []
+    for bpm in range(
+        max(int(sample_rate * 7.5 / (unit + tolerance)), 1),
+        int(sample_rate * 7.5 / max(unit - tolerance, 1)) + 2,
+    ):
+        candidate = unit_samples_for(bpm, sample_rate)
+        if candidate > 0 and abs(candidate - unit) <= tolerance:
+            candidates.append((total_samples % candidate != 0, abs(candidate - unit), candidate))
+    if candidates:
+        misses, distance, candidate = min(candidates)
+        if not misses or distance <= unit * 0.005:
+            return candidate
+    return int(round(unit))
+
+
+def decode_grid(audio, sample_rate, bpm=None, time_sig=None, morse_freq=620):
+    # int16 PCM -> (0/1 unit grid, unit_samples, offset of the first unit)
+    samples = np.asarray(audio, dtype=np.float32)
+    if bpm is not None:
+        unit = unit_samples_for(bpm, sample_rate)
+        offset = None
+        if time_sig is not None:
+            offset = get_meter(time_sig).count_in_units * unit
+        onset = None
+    else:
+        unit, onset = _estimate_grid(samples, sample_rate, morse_freq)
+        if unit is None:
+            return np.zeros(0, dtype=np.int8), None, None
+        offset = None
+
+    if offset is None:
+        # Count-in length unknown: the count-in is whole units, so snap
+        # the first tone onset onto the unit grid
+        if onset is None:
+            _, onset = _estimate_grid(samples, sample_rate, morse_freq)
+        if onset is None:
+            return np.zeros(0, dtype=np.int8), unit, None
+        offset = int(round(onset / unit)) * unit
+
+    if unit <= 0:
+        return np.zeros(0, dtype=np.int8), unit, offset
+    n_units = max((samples.size - offset) // unit, 0)
+    frames = samples[offset : offset + n_units * unit].reshape(n_units, unit)
+    grid = _active(tone_power(frames, morse_freq, sample_rate), unit).astype(np.int8)
+    return grid, unit, offset
+
+
+def grid_to_text(grid):
+    # Parse a unit grid into characters, None if it is not valid Morse.
+    # Where the audio is ambiguous ("-." vs ". .") the reading made of the
+    # more frequent characters wins.
+    onsets = np.flatnonzero(np.asarray(grid))
+    if not onsets.size:
+        return ""
+    gaps = np.diff(np.append(onsets, len(grid))) - 1
+
+    # pattern of the letter in progress -> (cost, best text so far)
+    states = {"": (0.0, "")}
+    last = len(gaps) - 1
+    for i, gap in enumerate(gaps.tolist()):
+        options = (_FINAL_GAP_OPTIONS if i == last else _GAP_OPTIONS).get(gap)
+        if options is None:
+            return None
+        next_states = {}
+        for pattern, (cost, text) in states.items():
+            for symbol, separator in options:
+                current = pattern + symbol
+                if separator is None:
+                    if current not in _PREFIXES:
+                        continue
+                    key, candidate = current, (cost, text)
+                else:
+                    ch = MORSE_TO_CHAR.get(current)
+                    if ch is None:
+                        continue
+                    key, candidate = "", (cost + _CHAR_COST[ch], text + ch + separator)
+                best = next_states.get(key)
+                if best is None or candidate[0] < best[0]:
+                    next_states[key] = candidate
+        if not next_states:
+            return None
+        states = next_states
+    final = states.get("")
+    return None if final is None else final[1].rstrip(" ")
+
+
+def decode_audio(audio, sample_rate, bpm=None, time_sig=None, morse_freq=620):
+    # bpm/time_sig are optional; without them the unit grid and count-in
+    # are recovered from the signal
+    grid, unit, offset = decode_grid(
+        audio, sample_rate, bpm=bpm, time_sig=time_sig, morse_freq=morse_freq
+    )
+    return {
+        "grid": grid,
+        "text": grid_to_text(grid),
+        "unit_samples": unit,
+        "offset": offset,
+    }
+
+
+def decode_wav(source, **options):
+    audio, sample_rate = read_wav(source)
+    return decode_audio(audio, sample_rate, **options)
+
+
+def grid_reads_as(grid, text):
+    # True when canonical_text(text) is a valid reading of the grid. Built
+    # from MORSE_DICT and the gap tables above rather than morse_grid, so
+    # it also catches a synth grid that is consistently wrong.
+    words = canonical_text(text).strip(" ").split(" ")
+    expected = []
+    for wi, word in enumerate(words):
+        for ci, ch in enumerate(word):
+            pattern = MORSE_DICT[ch]
+            for si, symbol in enumerate(pattern):
+                separator = None
+                if si == len(pattern) - 1:
+                    separator = "" if ci < len(word) - 1 or wi == len(words) - 1 else " "
+                expected.append((symbol, separator))
+    if expected and canonical_text(text).endswith(" "):
+        expected[-1] = (expected[-1][0], " ")
+
+    onsets = np.flatnonzero(np.asarray(grid))
+    if len(onsets) != len(expected):
+        return False
+    gaps = np.diff(np.append(onsets, len(grid))) - 1
+    last = len(gaps) - 1
+    for i, (gap, reading) in enumerate(zip(gaps.tolist(), expected)):
+        options = (_FINAL_GAP_OPTIONS if i == last else _GAP_OPTIONS).get(gap, ())
+        if reading not in options:
+            return False
+    return True
+
+
+def verify_round_trip(text, audio, sample_rate, bpm=None, time_sig=None, morse_freq=620):
+    # True when the audio carries exactly the unit grid `text` should
+    # produce and that grid reads back as the text
+    expected = np.asarray(morse_grid(text_to_morse(text)), dtype=np.int8)
+    grid, _, _ = decode_grid(
+        audio, sample_rate, bpm=bpm, time_sig=time_sig, morse_freq=morse_freq
+    )
+    # Trailing silence carries no information once the last tone is found
+    if not np.array_equal(np.trim_zeros(grid, "b"), np.trim_zeros(expected, "b")):
+        return False
+    # Where the audio is unambiguous the decoder's best reading must be
+    # the text itself; otherwise the text must be one of the readings
+    return grid_to_text(grid) == canonical_text(text).strip(" ") or grid_reads_as(grid, text)
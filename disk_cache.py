@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from morse import canonical_text
+
+
+# Bump when rendering output changes so stale entries stop matching
+CACHE_VERSION = 3
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "morse_rhythm_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Temp files older than this were left by a crashed writer
+STALE_TEMP_SECONDS = 3600
+TEMP_PREFIX = ".tmp-"
+
+
+class DiskCache:
+    # Content-addressed files shared by every process pointing at the same
+    # directory. Writes are atomic renames, a hit bumps the file's mtime,
+    # and eviction removes the least recently used files past max_bytes.
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written_since_scan = 0
+        # (text, canonical text) of the last key; a rerun keys several
+        # entries on the same text and need not tokenize it each time
+        self._last_text = (None, None)
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, kind, params):
+        params = dict(params)
+        if "text" in params:
+            params["text"] = self._canonical_text(params["text"])
+        canonical = json.dumps(
+            [CACHE_VERSION, kind, params], sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _canonical_text(self, text):
+        text = "" if text is None else str(text)
+        # One read and one write of the pair, so server threads sharing
+        # the cache never see a text with another text's canonical form
+        last_text, canonical = self._last_text
+        if last_text != text:
+            canonical = canonical_text(text)
+            self._last_text = (text, canonical)
+        return canonical
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, kind, params):
+        path = self._path(self.key(kind, params))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Record the access; an evictor may have removed it meanwhile
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, kind, params, data):
+        path = self._path(self.key(kind, params))
+        shard = os.path.dirname(path)
+        os.makedirs(shard, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=shard)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self._written_since_scan += len(data)
+        if self._written_since_scan >= self.max_bytes // 8:
+            self.evict()
+
+    def get_or_create(self, kind, params, build):
+        data = self.get(kind, params)
+        if data is None:
+            data = build()
+            if data:
+                self.put(kind, params, data)
+        return data
+
+    def get_json(self, kind, params):
+        data = self.get(kind, params)
+        return None if data is None else json.loads(data)
+
+    def put_json(self, kind, params, value):
+        self.put(kind, params, json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    def get_or_create_json(self, kind, params, build):
+        value = self.get_json(kind, params)
+        if value is None:
+            value = build()
+            self.put_json(kind, params, value)
+        return value
+
+    def evict(self, target_fraction=0.9):
+        # Drop least recently used entries until under target_fraction * max_bytes
+        self._written_since_scan = 0
+        now = time.time()
+        entries = []
+        total = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith(TEMP_PREFIX):
+                    if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                        _remove(entry.path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        limit = self.max_bytes * target_fraction
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            if _remove(path):
+                removed += 1
+            total -= size
+        return removed
+
+    def clear(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    _remove(entry.path)
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+_default_cache = None
+
+
+def default_cache():
+    # Process-wide cache configured from the environment; set
+    # MORSE_RHYTHM_CACHE_DIR to share one directory between servers
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DiskCache(
+            os.environ.get("MORSE_RHYTHM_CACHE_DIR", DEFAULT_DIRECTORY),
+            int(os.environ.get("MORSE_RHYTHM_CACHE_MB", DEFAULT_MAX_BYTES // (1024 * 1024)))
+            * 1024
+            * 1024,
+        )
+    return _default_cache
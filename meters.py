@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+# Time signatures offered in the UI, compiled once at import
+TIME_SIGNATURES = ("3/4", "4/4", "5/4", "6/4", "7/4", "6/8", "9/8", "12/8")
+
+DEFAULT_SVG_WIDTH = 720
+
+# Audio grid: 8 synth units per beat at the selected bpm (see components.py)
+AUDIO_UNITS_PER_BEAT = 8
+
+
+@dataclass(frozen=True)
+class Meter:
+    time_sig: str
+    numerator: int
+    denominator: int
+    # True for /8 meters drawn as groups of three eighths
+    compound: bool
+    # Multiplier applied to Morse durations when building rhythm events
+    unit_scale: int
+    # Grid steps per written beat
+    units_per_beat: int
+    # Grid steps per bar
+    bar_units: int
+    # Count labels under each visual step
+    labels: tuple
+    # Visual steps per beaming group
+    group_size: int
+    # Audio units between metronome clicks, and clicks per bar
+    click_units: int
+    clicks_per_bar: int
+    # Audio-unit offsets of each click within one bar
+    click_grid: tuple
+    # Audio units per grid step
+    audio_units_per_step: int
+    # Centre x of each visual step for a full bar at DEFAULT_SVG_WIDTH
+    step_x: tuple
+
+    @property
+    def count_in_units(self):
+        return self.click_units * self.clicks_per_bar
+
+
+@lru_cache(maxsize=None)
+def step_centers(count, width, left_margin=0):
+    # Centre x of each of `count` equal-width steps across the bar
+    if count <= 0:
+        return ()
+    step_width = width / count
+    return tuple(left_margin + i * step_width + step_width / 2 for i in range(count))
+
+
+def _labels(numerator, denominator):
+    if denominator == 8:
+        labels = []
+        for group in range(1, numerator // 3 + 1):
+            labels.extend([str(group), "pl", "let"])
+        return tuple(labels)
+
+    labels = []
+    for beat in range(1, numerator + 1):
+        labels.extend([str(beat), "e", "+", "a"])
+    return tuple(labels)
+
+
+def _compile(time_sig):
+    numerator, denominator = (int(part) for part in time_sig.split("/"))
+    compound = denominator == 8
+    if compound:
+        # /8 uses a larger unit scale for timing math
+        unit_scale = 2
+        units_per_beat = 2
+        group_size = 3
+        click_units = 6
+        clicks_per_bar = max(numerator // 3, 1)
+    else:
+        unit_scale = 1
+        units_per_beat = 4
+        group_size = 4
+        click_units = AUDIO_UNITS_PER_BEAT
+        clicks_per_bar = numerator
+
+    labels = _labels(numerator, denominator)
+    bar_units = numerator * units_per_beat
+    # /8 labels cover pairs of grid steps, /4 labels one step each
+    visual_steps = len(labels) or bar_units
+    return Meter(
+        time_sig=time_sig,
+        numerator=numerator,
+        denominator=denominator,
+        compound=compound,
+        unit_scale=unit_scale,
+        units_per_beat=units_per_beat,
+        bar_units=bar_units,
+        labels=labels,
+        group_size=group_size,
+        click_units=click_units,
+        clicks_per_bar=clicks_per_bar,
+        click_grid=tuple(range(0, click_units * clicks_per_bar, click_units)),
+        audio_units_per_step=2 // unit_scale,
+        step_x=step_centers(visual_steps, DEFAULT_SVG_WIDTH),
+    )
+
+
+METERS = {time_sig: _compile(time_sig) for time_sig in TIME_SIGNATURES}
+
+
+def get_meter(time_sig):
+    # Unlisted signatures are compiled on first use and kept
+    meter = METERS.get(time_sig)
+    if meter is None:
+        meter = _compile(time_sig)
+        METERS[time_sig] = meter
+    return meter
+
+
+def meter_for(numerator, denominator, keep=True):
+    # keep=False compiles a throwaway descriptor without registering it
+    time_sig = f"{numerator}/{denominator}"
+    if keep:
+        return get_meter(time_sig)
+    return METERS.get(time_sig) or _compile(time_sig)
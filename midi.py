@@ -0,0 +1,146 @@
+import struct
+from io import BytesIO
+
+from meters import AUDIO_UNITS_PER_BEAT, get_meter
+
+
+TICKS_PER_QUARTER = 480
+MORSE_CHANNEL = 0
+# General MIDI percussion lives on channel 10 (index 9)
+CLICK_CHANNEL = 9
+# D#5 is the nearest pitch to the 620 Hz synth tone
+MORSE_NOTE = 75
+# Hi and low wood block for downbeat / other clicks
+CLICK_NOTE_ACCENT = 76
+CLICK_NOTE = 77
+
+
+def _vlq(value):
+    # MIDI variable-length quantity, 7 bits per byte, high bit = more
+    out = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        out.insert(0, (value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(out)
+
+
+def _meta(meta_type, data):
+    return b"\xff" + bytes([meta_type]) + _vlq(len(data)) + data
+
+
+def ticks_per_step(meter, ppq=TICKS_PER_QUARTER):
+    # Grid steps are sixteenths in every supported meter
+    return ppq * 4 // (meter.denominator * meter.units_per_beat)
+
+
+def tempo_microseconds(bpm, meter, ppq=TICKS_PER_QUARTER):
+    # Same step duration the audio renderer uses, expressed per quarter note
+    step_seconds = meter.audio_units_per_step * 60 / (bpm * AUDIO_UNITS_PER_BEAT)
+    return round(step_seconds * 1_000_000 * ppq / ticks_per_step(meter, ppq))
+
+
+def _click_steps(meter):
+    return meter.click_units // meter.audio_units_per_step
+
+
+def _time_signature(meter):
+    denominator_power = meter.denominator.bit_length() - 1
+    # MIDI clocks between metronome clicks, 24 per quarter = 6 per sixteenth step
+    clocks = 6 * _click_steps(meter)
+    return bytes([meter.numerator, denominator_power, clocks, 8])
+
+
+def _track_events(
+    events,
+    spans,
+    bpm,
+    meter,
+    metronome_enabled,
+    markers,
+    count_in,
+    ppq,
+    note,
+    velocity,
+):
+    # (tick, order, message) tuples; order puts note-offs before note-ons
+    step_ticks = ticks_per_step(meter, ppq)
+    offset = meter.bar_units * step_ticks if count_in else 0
+    track = [
+        (0, 0, _meta(0x51, struct.pack(">I", tempo_microseconds(bpm, meter, ppq))[1:])),
+        (0, 0, _meta(0x58, _time_signature(meter))),
+    ]
+
+    tick = offset
+    for event in events:
+        length = int(event["duration"]) * step_ticks
+        if event["type"] == "note" and length:
+            track.append((tick, 2, bytes([0x90 | MORSE_CHANNEL, note, velocity])))
+            track.append((tick + length, 1, bytes([0x80 | MORSE_CHANNEL, note, 0])))
+        tick += length
+    end_tick = tick
+
+    if markers and spans:
+        for span in spans:
+            label = str(span["label"]).encode("utf-8")
+            track.append((offset + span["start"] * step_ticks, 0, _meta(0x06, label)))
+
+    if metronome_enabled:
+        click_ticks = _click_steps(meter) * step_ticks
+        click_length = max(step_ticks // 2, 1)
+        bar_ticks = meter.bar_units * step_ticks
+        for click in range(0, end_tick, click_ticks):
+            pitch = CLICK_NOTE_ACCENT if click % bar_ticks == 0 else CLICK_NOTE
+            track.append((click, 2, bytes([0x90 | CLICK_CHANNEL, pitch, velocity])))
+            track.append((click + click_length, 1, bytes([0x80 | CLICK_CHANNEL, pitch, 0])))
+
+    track.sort(key=lambda item: (item[0], item[1]))
+    return track
+
+
+def write_midi(
+    fileobj,
+    events,
+    bpm,
+    time_sig="4/4",
+    spans=None,
+    metronome_enabled=True,
+    markers=True,
+    count_in=True,
+    ppq=TICKS_PER_QUARTER,
+    note=MORSE_NOTE,
+    velocity=100,
+):
+    # Type-0 SMF from morse_to_events_with_spans output (events in grid steps)
+    meter = get_meter(time_sig)
+    track = _track_events(
+        events,
+        spans,
+        bpm,
+        meter,
+        metronome_enabled,
+        markers,
+        count_in,
+        ppq,
+        note,
+        velocity,
+    )
+    body = bytearray()
+    last_tick = 0
+    for tick, _, message in track:
+        body += _vlq(tick - last_tick)
+        body += message
+        last_tick = tick
+    body += b"\x00" + _meta(0x2F, b"")
+
+    fileobj.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, ppq))
+    fileobj.write(b"MTrk" + struct.pack(">I", len(body)))
+    fileobj.write(body)
+
+
+def midi_bytes_from_events(events, bpm, time_sig="4/4", spans=None, **options):
+    if not events:
+        return b""
+    buffer = BytesIO()
+    write_midi(buffer, events, bpm, time_sig=time_sig, spans=spans, **options)
+    return buffer.getvalue()
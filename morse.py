@@ -54,6 +54,9 @@ MORSE_DICT = {
     "_": "..--.-",
 }
 
+# Reverse lookup used when decoding patterns back to characters
+MORSE_TO_CHAR = {pattern: ch for ch, pattern in MORSE_DICT.items()}
+
 
 # Turn input text into a list of Morse tokens
 def text_to_morse(text):
@@ -79,3 +82,19 @@ def text_to_morse(text):
         morse.append({"type": "letter", "value": MORSE_DICT[ch], "char": ch})
 
     return morse
+
+
+# Shortest text that produces the given tokens
+def tokens_to_text(morse):
+    parts = []
+    for token in morse:
+        if token["type"] == "letter":
+            parts.append(token["char"])
+        elif token["type"] == "word_gap":
+            parts.append(" ")
+    return "".join(parts)
+
+
+# Shortest text that produces the same tokens, used as a cache key
+def canonical_text(text):
+    return tokens_to_text(text_to_morse(text))
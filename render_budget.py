@@ -0,0 +1,110 @@
+import os
+
+from components import unit_samples_for
+
+
+# Rough per-item render costs in seconds, from benchmarks/bench_budget.py.
+# Audio is synthesis plus WAV encoding; steps are score SVG plus MIDI work.
+# Tokenizing happens before planning, so it is charged for every character
+# of the input; building events and steps only for the steps kept.
+SAMPLE_SECONDS = 1.2e-8
+STEP_SECONDS = 2e-5
+PARSE_STEP_SECONDS = 2e-6
+TOKENIZE_CHAR_SECONDS = 2e-6
+# The estimates are rough, so plans aim this far under the budget
+HEADROOM = 0.8
+BRACKET_STEP_SECONDS = 7e-6
+LABEL_STEP_SECONDS = 2e-6
+# Audio falls back through these rates before the score is truncated
+SAMPLE_RATES = (44100, 22050, 11025)
+# Target seconds of render work per rerun; 0 turns degradation off
+DEFAULT_BUDGET_SECONDS = float(os.environ.get("MORSE_RHYTHM_RENDER_BUDGET", "1.0"))
+
+
+def estimate_render_seconds(
+    step_count,
+    meter,
+    bpm,
+    show_char_brackets=True,
+    show_inactive_labels=True,
+    sample_rate=44100,
+    audio=True,
+):
+    per_step = STEP_SECONDS + PARSE_STEP_SECONDS
+    if show_char_brackets:
+        per_step += BRACKET_STEP_SECONDS
+    if show_inactive_labels:
+        per_step += LABEL_STEP_SECONDS
+    seconds = step_count * per_step
+    if audio and step_count:
+        units = meter.count_in_units + step_count * meter.audio_units_per_step
+        seconds += units * unit_samples_for(bpm, sample_rate) * SAMPLE_SECONDS
+    return seconds
+
+
+def plan_render(
+    step_count,
+    meter,
+    bpm,
+    budget_s=None,
+    show_char_brackets=True,
+    show_inactive_labels=True,
+    sample_rate=44100,
+    audio=True,
+    text_length=0,
+):
+    # Settings that fit the estimate inside budget_s. Degrades in order:
+    # character brackets, inactive labels, audio sample rate, then the
+    # number of bars. "degradations" lists what was applied.
+    budget = (DEFAULT_BUDGET_SECONDS if budget_s is None else budget_s) * HEADROOM
+    tokenize_s = text_length * TOKENIZE_CHAR_SECONDS
+    plan = {
+        "show_char_brackets": show_char_brackets,
+        "show_inactive_labels": show_inactive_labels,
+        "sample_rate": sample_rate,
+        "max_bars": None,
+        "degradations": [],
+    }
+
+    def estimate(steps=step_count):
+        return tokenize_s + estimate_render_seconds(
+            steps,
+            meter,
+            bpm,
+            show_char_brackets=plan["show_char_brackets"],
+            show_inactive_labels=plan["show_inactive_labels"],
+            sample_rate=plan["sample_rate"],
+            audio=audio,
+        )
+
+    if budget <= 0:
+        plan["estimate_s"] = estimate()
+        return plan
+
+    for option in ("show_char_brackets", "show_inactive_labels"):
+        if plan[option] and estimate() > budget:
+            plan[option] = False
+            plan["degradations"].append(option)
+    if audio:
+        for rate in SAMPLE_RATES:
+            if rate < plan["sample_rate"] and estimate() > budget:
+                plan["sample_rate"] = rate
+                if "sample_rate" not in plan["degradations"]:
+                    plan["degradations"].append("sample_rate")
+
+    if estimate() > budget:
+        # Whatever is left goes to whole bars; always keep at least one
+        fixed = tokenize_s
+        if audio:
+            # The count-in bar is rendered however short the text is
+            fixed += meter.count_in_units * unit_samples_for(bpm, plan["sample_rate"]) * SAMPLE_SECONDS
+        per_bar = estimate(meter.bar_units) - fixed
+        max_bars = max(1, int((budget - fixed) // per_bar))
+        if max_bars * meter.bar_units < step_count:
+            plan["max_bars"] = max_bars
+            plan["degradations"].append("max_bars")
+            step_count = max_bars * meter.bar_units
+
+    plan["estimate_s"] = estimate(step_count)
+    return plan
+
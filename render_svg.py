@@ -1,44 +1,398 @@
+import hashlib
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.sax.saxutils import escape
+
+from meters import DEFAULT_SVG_WIDTH, meter_for, step_centers
+
+
+INK = "#111"
+LABEL_INK = "#333"
+# Below this many bars a worker pool costs more than it saves
+PARALLEL_MIN_BARS = 128
+# Repeated score elements shorter than this stay inline (a <use> is ~30 bytes)
+MIN_SHARED_ELEMENT = 48
+# Chunks handed to each worker; a few per worker evens out uneven bars
+CHUNKS_PER_WORKER = 4
+# Decimals written for compact and score coordinates; None writes them exactly
+COORD_PRECISION = 3
+
+
 def labels_for_bar(numerator, denominator):
-    if denominator == 8:
-        labels = []
-        groups = numerator // 3
-        for group in range(1, groups + 1):
-            labels.extend([str(group), "pl", "let"])
-        return labels
-
-    if denominator == 4:
-        units = 4
-    elif denominator == 8:
-        units = 2
+    return list(meter_for(numerator, denominator).labels)
+
+
+def _fmt(value, precision):
+    # Coordinate without trailing zeros or "-0". precision=COORD_PRECISION keeps the
+    # exact value as repr() writes it.
+    if precision is None:
+        text = repr(float(value))
     else:
-        units = 4
+        text = f"{value:.{precision}f}"
+    text = text.rstrip("0").rstrip(".") if "." in text else text
+    return "0" if text in ("", "-0") else text
+
+
+class _ElementWriter:
+    # One SVG element per shape, values written exactly as computed
+    def __init__(self, width, height):
+        self.parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">'
+        ]
+
+    def line(self, x1, y1, x2, y2, stroke_width=None):
+        width_attr = "" if stroke_width is None else f' stroke-width="{stroke_width}"'
+        self.parts.append(
+            f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
+            f'stroke="{INK}"{width_attr} />'
+        )
+
+    def ellipse(self, cx, cy, rx, ry):
+        self.parts.append(
+            f'<ellipse cx="{cx}" cy="{cy}" rx="{rx}" ry="{ry}" fill="{INK}" />'
+        )
+
+    def circle(self, cx, cy, r):
+        self.parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{INK}" />')
+
+    def text(self, x, y, label, font_size, fill):
+        self.parts.append(
+            f'<text x="{x}" y="{y}" font-size="{font_size}" '
+            f'text-anchor="middle" fill="{fill}">{escape(label)}</text>'
+        )
+
+    def finish(self):
+        self.parts.append("</svg>")
+        return "".join(self.parts)
+
+
+def _boxes_touch(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class _PathWriter:
+    # Coalesces same-styled shapes into single <path> or <g> elements while
+    # keeping paint order: a shape joins an earlier element of its style
+    # only if nothing painted since then, nor that element itself, touches
+    # it. Overlapping antialiased edges then blend exactly as the separate
+    # elements of element mode do.
+    def __init__(self, width, height, precision=COORD_PRECISION):
+        self.width = width
+        self.height = height
+        self.precision = precision
+        # [style, fragments, boxes, union of boxes] in paint order
+        self.items = []
+
+    def _n(self, value):
+        return _fmt(value, self.precision)
+
+    def _add(self, style, fragment, box):
+        for item in reversed(self.items):
+            if _boxes_touch(box, item[3]) and any(
+                _boxes_touch(box, other) for other in item[2]
+            ):
+                break
+            if item[0] == style:
+                item[1].append(fragment)
+                item[2].append(box)
+                union = item[3]
+                item[3] = (
+                    min(union[0], box[0]),
+                    min(union[1], box[1]),
+                    max(union[2], box[2]),
+                    max(union[3], box[3]),
+                )
+                return
+        self.items.append([style, [fragment], [box], box])
+
+    def line(self, x1, y1, x2, y2, stroke_width=None):
+        # SVG default stroke width is 1
+        width = 1 if stroke_width is None else stroke_width
+        n = self._n
+        # Pad by the half width plus one antialiasing pixel
+        pad = width / 2 + 1
+        self._add(
+            ("stroke", width),
+            f"M{n(x1)} {n(y1)}L{n(x2)} {n(y2)}",
+            (min(x1, x2) - pad, min(y1, y2) - pad, max(x1, x2) + pad, max(y1, y2) + pad),
+        )
+
+    def ellipse(self, cx, cy, rx, ry):
+        # Two half arcs trace the full ellipse
+        n = self._n
+        self._add(
+            ("fill",),
+            f"M{n(cx - rx)} {n(cy)}a{n(rx)} {n(ry)} 0 1 0 {n(2 * rx)} 0"
+            f"a{n(rx)} {n(ry)} 0 1 0 {n(-2 * rx)} 0z",
+            (cx - rx - 1, cy - ry - 1, cx + rx + 1, cy + ry + 1),
+        )
+
+    def circle(self, cx, cy, r):
+        self.ellipse(cx, cy, r, r)
+
+    def text(self, x, y, label, font_size, fill):
+        # Generous glyph box: wide advance, ascender above the baseline
+        half = font_size * 0.4 * max(len(label), 1) + 2
+        self._add(
+            ("text", font_size, fill),
+            f'<text x="{self._n(x)}" y="{self._n(y)}">{escape(label)}</text>',
+            (x - half, y - font_size - 2, x + half, y + font_size * 0.5 + 2),
+        )
+
+    def elements(self):
+        parts = []
+        for style, fragments, _, _ in self.items:
+            if style[0] == "stroke":
+                parts.append(
+                    f'<path d="{"".join(fragments)}" fill="none" stroke="{INK}" '
+                    f'stroke-width="{style[1]}"/>'
+                )
+            elif style[0] == "fill":
+                parts.append(f'<path d="{"".join(fragments)}" fill="{INK}"/>')
+            else:
+                parts.append(
+                    f'<g font-size="{style[1]}" text-anchor="middle" fill="{style[2]}">'
+                    f'{"".join(fragments)}</g>'
+                )
+        return parts
+
+    def body(self):
+        return "".join(self.elements())
+
+    def finish(self):
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" '
+            f'height="{self.height}" viewBox="0 0 {self.width} {self.height}">'
+            f"{self.body()}</svg>"
+        )
+
+
+_ELEMENT_RE = re.compile(r"<(?![/!?])")
+
+
+def svg_stats(svg):
+    # Payload size and element count of a rendered SVG string
+    return {
+        "bytes": len(svg.encode("utf-8")),
+        "elements": len(_ELEMENT_RE.findall(svg)),
+    }
 
-    labels = []
-    for beat in range(1, numerator + 1):
-        if units == 4:
-            labels.extend([str(beat), "e", "+", "a"])
-        else:
-            labels.extend([str(beat), "+"])
-    return labels
 
 def render_bar_svg(
     bar_steps,
-    labels,
-    units_per_beat,
-    denominator,
+    meter,
     is_last_bar=False,
     show_inactive_labels=True,
     annotations=None,
     width=720,
     height=120,
+    compact=False,
+    precision=COORD_PRECISION,
+):
+    if compact:
+        svg = _PathWriter(width, height, precision)
+    else:
+        svg = _ElementWriter(width, height)
+    drawn = _draw_bar(
+        svg,
+        bar_steps,
+        meter,
+        is_last_bar=is_last_bar,
+        show_inactive_labels=show_inactive_labels,
+        annotations=annotations,
+        width=width,
+    )
+    return svg.finish() if drawn else ""
+
+
+def _render_bar_chunk(chunk, meter, last_index, options):
+    # Worker entry point; chunk is a list of (index, bar_steps, annotations)
+    return [
+        render_bar_svg(
+            bar_steps,
+            meter,
+            is_last_bar=idx == last_index,
+            annotations=bar_annotations,
+            **options,
+        )
+        for idx, bar_steps, bar_annotations in chunk
+    ]
+
+
+def _map_chunks(pool, chunks, meter, last_index, options):
+    futures = [
+        pool.submit(_render_bar_chunk, chunk, meter, last_index, options)
+        for chunk in chunks
+    ]
+    svgs = []
+    for future in futures:
+        svgs.extend(future.result())
+    return svgs
+
+
+def render_bars_svg(
+    bars,
+    meter,
+    annotations=None,
+    show_inactive_labels=True,
+    width=720,
+    height=120,
+    compact=False,
+    precision=COORD_PRECISION,
+    executor="process",
+    workers=None,
+    chunk_size=None,
+    min_parallel_bars=PARALLEL_MIN_BARS,
+):
+    # One SVG per bar, in bar order, same as calling render_bar_svg in a
+    # loop. executor is "process", "thread", "serial" or an Executor to
+    # reuse; short scores render serially. A process pool that cannot
+    # start falls back to threads.
+    if executor not in ("process", "thread", "serial") and not isinstance(executor, Executor):
+        raise ValueError(f"unknown executor {executor!r}")
+    options = {
+        "show_inactive_labels": show_inactive_labels,
+        "width": width,
+        "height": height,
+        "compact": compact,
+        "precision": precision,
+    }
+    items = [
+        (idx, bar_steps, annotations[idx] if annotations else None)
+        for idx, bar_steps in enumerate(bars)
+    ]
+    last_index = len(items) - 1
+    workers = workers or os.cpu_count() or 1
+    if (
+        executor == "serial"
+        or len(items) < min_parallel_bars
+        or (workers < 2 and isinstance(executor, str))
+    ):
+        return _render_bar_chunk(items, meter, last_index, options)
+
+    # Whole chunks per task so pickling and IPC are paid per chunk, not per bar
+    chunk_size = chunk_size or -(-len(items) // (workers * CHUNKS_PER_WORKER))
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if isinstance(executor, Executor):
+        return _map_chunks(executor, chunks, meter, last_index, options)
+    if executor == "process":
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return _map_chunks(pool, chunks, meter, last_index, options)
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No usable process pool here (sandbox, no sem_open, killed worker)
+            pass
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return _map_chunks(pool, chunks, meter, last_index, options)
+
+
+def render_score_svg(
+    bars,
+    meter,
+    annotations=None,
+    show_inactive_labels=True,
+    width=720,
+    height=120,
+    row_gap=0,
+    precision=COORD_PRECISION,
+    id_prefix=None,
+):
+    # One document for the whole score. Each bar is drawn as coalesced
+    # paths; those paths and whole bars that repeat verbatim are defined
+    # once in <defs> and placed with <use>; there are no per-glyph defs.
+    # Ids carry a per-document prefix so several inlined scores never clash.
+    rows = []
+    last_index = len(bars) - 1
+    for idx, bar_steps in enumerate(bars):
+        svg = _PathWriter(width, height, precision)
+        drawn = _draw_bar(
+            svg,
+            bar_steps,
+            meter,
+            is_last_bar=idx == last_index,
+            show_inactive_labels=show_inactive_labels,
+            annotations=annotations[idx] if annotations else None,
+            width=width,
+        )
+        if drawn:
+            rows.append(svg.elements())
+    if not rows:
+        return ""
+
+    if id_prefix is None:
+        # Same score, same ids, so cached documents stay byte-stable
+        digest = hashlib.sha1("".join(map("".join, rows)).encode("utf-8")).hexdigest()[:8]
+        id_prefix = f"s{digest}-"
+    defs = []
+
+    # Repeated elements (label rows, common beams) are defined once; a
+    # <use> in the same place keeps paint order and element count
+    counts = {}
+    for elements in rows:
+        for element in elements:
+            counts[element] = counts.get(element, 0) + 1
+    element_uses = {}
+    for element, count in counts.items():
+        if count > 1 and len(element) > MIN_SHARED_ELEMENT:
+            element_id = f"{id_prefix}e{len(element_uses)}"
+            # '<path ...' / '<g ...' gain the id after the tag name
+            defs.append(element.replace(" ", f' id="{element_id}" ', 1))
+            element_uses[element] = f'<use href="#{element_id}"/>'
+    rows = ["".join(element_uses.get(e, e) for e in elements) for elements in rows]
+
+    counts = {}
+    for body in rows:
+        counts[body] = counts.get(body, 0) + 1
+    bar_ids = {}
+    for body, count in counts.items():
+        if count > 1:
+            bar_ids[body] = f"{id_prefix}b{len(bar_ids)}"
+            defs.append(f'<g id="{bar_ids[body]}">{body}</g>')
+
+    pitch = height + row_gap
+    total_height = pitch * len(rows) - row_gap
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{total_height}" '
+        f'viewBox="0 0 {width} {total_height}">'
+    ]
+    if defs:
+        parts.append(f'<defs>{"".join(defs)}</defs>')
+    for row_index, body in enumerate(rows):
+        y = row_index * pitch
+        if body in bar_ids:
+            parts.append(f'<use href="#{bar_ids[body]}" y="{y}"/>')
+        elif y:
+            parts.append(f'<g transform="translate(0 {y})">{body}</g>')
+        else:
+            parts.append(body)
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _draw_bar(
+    svg,
+    bar_steps,
+    meter,
+    is_last_bar=False,
+    show_inactive_labels=True,
+    annotations=None,
+    width=720,
 ):
     steps_per_bar = len(bar_steps)
     if steps_per_bar == 0:
-        return ""
+        return False
+
+    labels = meter.labels
+    units_per_beat = meter.units_per_beat
+    compound = meter.compound
+    beam_group = meter.group_size
 
     # Trim trailing empty quarter-note groups only on the final bar
-    if denominator == 4 and is_last_bar:
-        group_size = 4
+    if not compound and is_last_bar:
+        group_size = beam_group
         trimmed_steps = list(bar_steps)
         while len(trimmed_steps) >= group_size:
             tail = trimmed_steps[-group_size:]
@@ -47,7 +401,7 @@ def render_bar_svg(
             trimmed_steps = trimmed_steps[:-group_size]
 
         if not trimmed_steps:
-            return ""
+            return False
 
         bar_steps = trimmed_steps
         steps_per_bar = len(bar_steps)
@@ -63,15 +417,7 @@ def render_bar_svg(
     note_y = 75
     label_y = 100
 
-    svg = [
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
-        f'viewBox="0 0 {width} {height}">'
-    ]
-    svg.append(
-        f'<line x1="{left_margin}" y1="{staff_y1 - 2}" '
-        f'x2="{left_margin}" y2="{stem_bottom + 5}" '
-        f'stroke="#111" stroke-width="2" />'
-    )
+    svg.line(left_margin, staff_y1 - 2, left_margin, stem_bottom + 5, 2)
     # Decide whether labels map 1:1 to steps or need grouping
     label_count = len(labels)
     use_label_grid = label_count == steps_per_bar
@@ -91,24 +437,23 @@ def render_bar_svg(
     step_width = bar_draw_width / visual_count
     render_limit = visual_count
     # For compound meters, shrink rendering to the last active group
-    if denominator == 8:
+    if compound:
         last_active_group = -1
-        for gi in range(0, visual_count, 3):
-            group = visual_steps[gi : gi + 3]
+        for gi in range(0, visual_count, beam_group):
+            group = visual_steps[gi : gi + beam_group]
             if any(group):
-                last_active_group = gi // 3
+                last_active_group = gi // beam_group
         if last_active_group == -1:
-            return ""
-        render_limit = (last_active_group + 1) * 3
+            return False
+        render_limit = (last_active_group + 1) * beam_group
 
     # In /4, render beamed noteheads and per-group separators
-    if denominator == 4:
+    if not compound:
         beam_top_y = staff_y2
         beam_second_y = staff_y2 + 6
         beam_thickness = 3
         dot_radius = 2
         dot_offset = 12
-        separator_width = 1
 
         def x_for_pos(pos):
             return left_margin + (pos + 0.5) * step_width
@@ -118,25 +463,17 @@ def render_bar_svg(
             x2 = x_for_pos(end_pos)
             if x2 < x1:
                 x1, x2 = x2, x1
-            svg.append(
-                f'<line x1="{x1}" y1="{y}" x2="{x2}" y2="{y}" '
-                f'stroke="#111" stroke-width="{beam_thickness}" />'
-            )
+            svg.line(x1, y, x2, y, beam_thickness)
 
         def add_short_beam(y, start_pos):
             x1 = x_for_pos(start_pos)
             x2 = x1 + step_width * 0.25
             y2 = y + 2
-            svg.append(
-                f'<line x1="{x1}" y1="{y}" x2="{x2}" y2="{y2}" '
-                f'stroke="#111" stroke-width="{beam_thickness}" />'
-            )
+            svg.line(x1, y, x2, y2, beam_thickness)
 
         def add_dot(step_index):
             x = x_for_pos(step_index)
-            svg.append(
-                f'<circle cx="{x + dot_offset}" cy="{note_y}" r="{dot_radius}" fill="#111" />'
-            )
+            svg.circle(x + dot_offset, note_y, dot_radius)
 
         pattern_map = {
             "1100": {"top": [(0, 1)], "second": [(0, 0.25)], "dots": [1]},
@@ -160,21 +497,17 @@ def render_bar_svg(
                 break
             if g + 4 < steps_per_bar:
                 boundary_x = left_margin + (g + 4) * step_width
-                svg.append(
-                    f'<line x1="{boundary_x}" y1="{stem_top}" '
-                    f'x2="{boundary_x}" y2="{stem_bottom}" '
-                    f'stroke="#111" stroke-width="{separator_width}" />'
-                )
+                svg.line(boundary_x, stem_top, boundary_x, stem_bottom, 1)
             pattern = "".join("1" if step.get("active") else "0" for step in group)
             if pattern in ("0101", "0001"):
-                for idx, step in enumerate(group):
-                    if step.get("active"):
+                for idx, symbol in enumerate(pattern):
+                    if symbol == "1":
                         add_short_beam(beam_top_y, g + idx)
                         add_short_beam(beam_second_y, g + idx)
                 continue
-            if pattern.count("1") <= 1 and pattern not in pattern_map:
+            if pattern not in pattern_map:
                 continue
-            beams = pattern_map.get(pattern, {"top": [], "second": [], "dots": []})
+            beams = pattern_map[pattern]
             for start, end in beams["top"]:
                 add_beam(beam_top_y, g + start, g + end)
             for start, end in beams["second"]:
@@ -182,26 +515,19 @@ def render_bar_svg(
             for idx in beams["dots"]:
                 add_dot(g + idx)
     else:
-        staff_group = 3
-        separator_width = 1
+        staff_group = beam_group
         for g in range(0, render_limit, staff_group):
-            start_x = left_margin + g * step_width + step_width / 2
             end_index = min(g + staff_group - 1, render_limit - 1)
+            start_x = left_margin + g * step_width + step_width / 2
             end_x = left_margin + end_index * step_width + step_width / 2
-            svg.append(
-                f'<line x1="{start_x}" y1="{staff_y2}" '
-                f'x2="{end_x}" y2="{staff_y2}" stroke="#111" />'
-            )
+            svg.line(start_x, staff_y2, end_x, staff_y2)
             if g + staff_group < render_limit:
                 boundary_x = left_margin + (g + staff_group) * step_width
-                svg.append(
-                    f'<line x1="{boundary_x}" y1="{stem_top}" '
-                    f'x2="{boundary_x}" y2="{stem_bottom}" '
-                    f'stroke="#111" stroke-width="{separator_width}" />'
-                )
+                svg.line(boundary_x, stem_top, boundary_x, stem_bottom, 1)
     if annotations:
         bracket_y = staff_y2 - 18
         bracket_cap = 6
+
         for span in annotations:
             start = span["start"]
             end = span["end"]
@@ -219,39 +545,33 @@ def render_bar_svg(
                 continue
             x1 = left_margin + (start + 0.5) * step_width
             x2 = left_margin + (end + 0.5) * step_width
-            svg.append(
-                f'<line x1="{x1}" y1="{bracket_y}" x2="{x2}" y2="{bracket_y}" '
-                f'stroke="#111" stroke-width="1" />'
-            )
-            svg.append(
-                f'<line x1="{x1}" y1="{bracket_y}" x2="{x1}" y2="{bracket_y + bracket_cap}" '
-                f'stroke="#111" stroke-width="1" />'
-            )
-            svg.append(
-                f'<line x1="{x2}" y1="{bracket_y}" x2="{x2}" y2="{bracket_y + bracket_cap}" '
-                f'stroke="#111" stroke-width="1" />'
-            )
-            svg.append(
-                f'<text x="{(x1 + x2) / 2}" y="{bracket_y - 2}" font-size="16" '
-                f'text-anchor="middle" fill="#111">{label}</text>'
-            )
+            svg.line(x1, bracket_y, x2, bracket_y, 1)
+            svg.line(x1, bracket_y, x1, bracket_y + bracket_cap, 1)
+            svg.line(x2, bracket_y, x2, bracket_y + bracket_cap, 1)
+            svg.text((x1 + x2) / 2, bracket_y - 2, label, 16, INK)
+    stem_height = stem_bottom - stem_top
+    shrink = stem_height * 0.25
+    short_top = stem_top + shrink
+    short_bottom = stem_bottom - shrink
+    tilt = step_width * 0.06
+    flag_len = step_width * 0.25
+
     # Draw stems/flags or inactive markers, then optional labels
+    if width == DEFAULT_SVG_WIDTH and visual_count == len(meter.step_x):
+        step_x = meter.step_x
+    else:
+        step_x = step_centers(visual_count, bar_draw_width, left_margin)
     for i, is_active in enumerate(visual_steps[:render_limit]):
-        x = left_margin + i * step_width + step_width / 2
+        x = step_x[i]
         stroke_width = 2 if use_label_grid and i % units_per_beat == 0 else 2
 
         if is_active:
-            svg.append(
-                f'<line x1="{x}" y1="{stem_top}" x2="{x}" y2="{stem_bottom}" '
-                f'stroke="#111" stroke-width="{stroke_width}" />'
-            )
-            svg.append(
-                f'<ellipse cx="{x - 4}" cy="{note_y}" rx="6" ry="4" fill="#111" />'
-            )
+            svg.line(x, stem_top, x, stem_bottom, stroke_width)
+            svg.ellipse(x - 4, note_y, 6, 4)
         else:
             skip_inactive = False
             label = labels[i] if label_count and i < label_count else ""
-            if denominator == 4 and use_label_grid:
+            if not compound and use_label_grid:
                 group_start = (i // 4) * 4
                 group_end = group_start + 3
                 if group_end < steps_per_bar:
@@ -285,44 +605,21 @@ def render_bar_svg(
                             skip_inactive = True
 
             if not skip_inactive:
-                stem_height = stem_bottom - stem_top
-                shrink = stem_height * 0.25
-                short_top = stem_top + shrink
-                short_bottom = stem_bottom - shrink
-                tilt = step_width * 0.06
-                svg.append(
-                    f'<line x1="{x + tilt}" y1="{short_top}" x2="{x - tilt}" y2="{short_bottom}" '
-                    f'stroke="#111" stroke-width="{stroke_width}" />'
-                )
-                flag_len = step_width * 0.25
+                # Slanted sixteenth-rest stem with one or two flags
+                svg.line(x + tilt, short_top, x - tilt, short_bottom, stroke_width)
                 flag_end = x + tilt - 1
                 flag_start = flag_end - flag_len
-                svg.append(
-                    f'<line x1="{flag_start}" y1="{short_top}" x2="{flag_end}" y2="{short_top}" '
-                    f'stroke="#111" stroke-width="{stroke_width}" />'
-                )
-                if not (denominator == 4 and use_label_grid and single_flag):
-                    svg.append(
-                        f'<line x1="{flag_start}" y1="{short_top + 4}" x2="{flag_end}" y2="{short_top + 4}" '
-                        f'stroke="#111" stroke-width="{stroke_width}" />'
-                    )
+                svg.line(flag_start, short_top, flag_end, short_top, stroke_width)
+                if compound or not (use_label_grid and single_flag):
+                    svg.line(flag_start, short_top + 4, flag_end, short_top + 4, stroke_width)
 
         if label_count and i < label_count:
             label = labels[i]
             if label and (show_inactive_labels or is_active):
-                svg.append(
-                    f'<text x="{x}" y="{label_y}" font-size="18" '
-                    f'text-anchor="middle" fill="#333">{label}</text>'
-                )
+                svg.text(x, label_y, label, 18, LABEL_INK)
 
     barline_x = width - right_margin
-    if denominator == 8:
+    if compound:
         barline_x = left_margin + render_limit * step_width
-    svg.append(
-        f'<line x1="{barline_x}" y1="{staff_y1 - 2}" '
-        f'x2="{barline_x}" y2="{stem_bottom + 5}" '
-        f'stroke="#111" stroke-width="2" />'
-    )
-
-    svg.append("</svg>")
-    return "".join(svg)
+    svg.line(barline_x, staff_y1 - 2, barline_x, stem_bottom + 5, 2)
+    return True
@@ -1,3 +1,5 @@
+from meters import meter_for
+
 # DEFINE TIMINGS HERE (For future use)
 DOT = 1
 DASH = 2
@@ -8,9 +10,7 @@ WORD_GAP = 3
 
 def timing_scale(numerator, denominator):
     # /8 uses a larger unit scale for timing math
-    if denominator == 8:
-        return 2
-    return 1
+    return meter_for(numerator, denominator).unit_scale
 
 
 def morse_to_events(morse, unit_scale=1):
@@ -137,6 +137,60 @@ def events_to_steps(events):
     return steps
 
 
+def _letter_steps(morse, unit_scale):
+    # (start, steps) per letter token, counting the gap that follows it,
+    # as morse_to_events_with_spans would lay them out
+    dash = max(DASH, DOT)
+    current = 0
+    for i, token in enumerate(morse):
+        if token["type"] != "letter":
+            continue
+        pattern = token.get("value", "")
+        steps = sum(DOT if symbol == "." else dash for symbol in pattern if symbol in ".-")
+        steps += INTRA_SYMBOL_GAP * max(len(pattern) - 1, 0)
+        next_type = morse[i + 1]["type"] if i + 1 < len(morse) else None
+        if next_type == "letter_gap":
+            steps += LETTER_GAP
+        elif next_type == "word_gap":
+            steps += WORD_GAP
+        yield i, current, steps * unit_scale
+        current += steps * unit_scale
+
+
+def token_step_count(morse, unit_scale=1):
+    # Grid length of the tokens without building events or steps
+    return sum(steps for _, _, steps in _letter_steps(morse, unit_scale))
+
+
+def truncate_tokens(morse, max_steps, unit_scale=1):
+    # Leading tokens covering the first max_steps steps: every letter that
+    # starts before the cut, then the first one after it so the gap that
+    # precedes it survives a round trip through tokens_to_text
+    for i, start, _ in _letter_steps(morse, unit_scale):
+        if start >= max_steps:
+            return morse[: i + 1]
+    return morse
+
+
+def truncate_events(events, spans, max_steps):
+    # Events and spans cut to the first max_steps steps; an event that
+    # crosses the cut keeps only its leading part
+    kept = []
+    position = 0
+    for event in events:
+        if position >= max_steps:
+            break
+        duration = min(int(event["duration"]), max_steps - position)
+        kept.append(dict(event, duration=duration) if duration != event["duration"] else event)
+        position += duration
+    kept_spans = [
+        dict(span, end=min(span["end"], max_steps - 1))
+        for span in spans
+        if span["start"] < max_steps
+    ]
+    return kept, kept_spans
+
+
 def split_into_bars(steps, bar_units):
     # Pad the grid to full bars, then slice into bar-sized chunks
     if not steps:
@@ -157,10 +211,40 @@ def split_into_bars(steps, bar_units):
     return bars
 
 
+class SpanIndex:
+    # Character spans bucketed once by bar number and rebased to bar-local
+    # steps, so each bar's brackets come back without rescanning all spans
+    def __init__(self, spans, bar_units):
+        self.bar_units = bar_units
+        self.buckets = {}
+        if bar_units <= 0:
+            return
+        for span in spans:
+            first_bar = max(span["start"], 0) // bar_units
+            last_bar = span["end"] // bar_units
+            # Characters crossing a bar line land in every bar they touch
+            for bar in range(first_bar, last_bar + 1):
+                bar_start = bar * bar_units
+                self.buckets.setdefault(bar, []).append(
+                    {
+                        "start": span["start"] - bar_start,
+                        "end": span["end"] - bar_start,
+                        "label": span["label"],
+                    }
+                )
+
+    def for_bar(self, bar_index):
+        return self.buckets.get(bar_index, [])
+
+    def for_bars(self, bar_count):
+        return [self.for_bar(idx) for idx in range(bar_count)]
+
+
+def annotations_for_bars(spans, bar_count, bar_units):
+    # Character brackets overlapping each bar, rebased to bar-local steps
+    return SpanIndex(spans, bar_units).for_bars(bar_count)
+
+
 def units_per_beat(denominator):
     # Grid resolution for labels per beat
-    if denominator == 4:
-        return 4
-    if denominator == 8:
-        return 2
-    return 4
+    return meter_for(1, denominator, keep=False).units_per_beat
@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from components import build_morse_metronome_wave, wav_bytes_from_audio
+from disk_cache import CACHE_VERSION, DiskCache
+from meters import TIME_SIGNATURES, get_meter
+from midi import midi_bytes_from_events
+from morse import canonical_text, text_to_morse
+from render_svg import render_bars_svg, render_score_svg
+from rhythm import (
+    annotations_for_bars,
+    events_to_steps,
+    morse_to_events_with_spans,
+    split_into_bars,
+)
+from telemetry import setup_logging
+
+
+logger = logging.getLogger("morse_rhythm.server")
+
+MAX_TEXT_LENGTH = 2000
+# A JSON body for the longest text: \uXXXX escapes of surrogate pairs take
+# 12 bytes per character, plus room for the other fields
+MAX_BODY_BYTES = 12 * MAX_TEXT_LENGTH + 1024
+MIN_BPM = 20
+MAX_BPM = 400
+SVG_WIDTH = 720
+SVG_HEIGHT = 120
+
+# Outputs with nothing to return for text that encodes to no Morse
+DOCUMENT_KINDS = ("score", "wav", "midi")
+
+CONTENT_TYPES = {
+    "bars": "application/json",
+    "score": "image/svg+xml",
+    "wav": "audio/wav",
+    "midi": "audio/midi",
+    "events": "application/json",
+}
+
+
+class RequestError(ValueError):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _flag(payload, name, default):
+    value = payload.get(name, default)
+    if not isinstance(value, bool):
+        raise RequestError(400, f"{name} must be true or false")
+    return value
+
+
+def normalize_request(payload):
+    # Defaults mirror the Streamlit UI; unknown keys are ignored
+    if not isinstance(payload, dict):
+        raise RequestError(400, "request body must be a JSON object")
+    text = payload.get("text")
+    text = "" if text is None else str(text)
+    if len(text) > MAX_TEXT_LENGTH:
+        raise RequestError(413, f"text longer than {MAX_TEXT_LENGTH} characters")
+    time_sig = str(payload.get("time_sig", "4/4"))
+    if time_sig not in TIME_SIGNATURES:
+        raise RequestError(400, f"time_sig must be one of {', '.join(TIME_SIGNATURES)}")
+    try:
+        bpm = int(payload.get("bpm", 60))
+    except (TypeError, ValueError):
+        raise RequestError(400, "bpm must be an integer") from None
+    if not MIN_BPM <= bpm <= MAX_BPM:
+        raise RequestError(400, f"bpm must be between {MIN_BPM} and {MAX_BPM}")
+    return {
+        # Texts that produce the same Morse share ETags and cache entries
+        "text": canonical_text(text),
+        "time_sig": time_sig,
+        "bpm": bpm,
+        "metronome": _flag(payload, "metronome", True),
+        "show_inactive_labels": _flag(payload, "show_inactive_labels", True),
+        "show_char_brackets": _flag(payload, "show_char_brackets", True),
+    }
+
+
+def request_etag(kind, params):
+    # CACHE_VERSION changes whenever rendered bytes do, so clients holding
+    # an older response miss on If-None-Match instead of keeping it
+    canonical = json.dumps(
+        [CACHE_VERSION, kind, params], sort_keys=True, separators=(",", ":")
+    )
+    return '"' + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def render_payload(kind, params):
+    # Runs inside the worker pool, so it only takes and returns plain data
+    meter = get_meter(params["time_sig"])
+    if kind == "wav":
+        audio, sample_rate = build_morse_metronome_wave(
+            params["text"],
+            params["bpm"],
+            time_sig=params["time_sig"],
+            metronome_enabled=params["metronome"],
+        )
+        return wav_bytes_from_audio(audio, sample_rate)
+
+    tokens = text_to_morse(params["text"])
+    events, spans = morse_to_events_with_spans(tokens, unit_scale=meter.unit_scale)
+    if kind == "midi":
+        return midi_bytes_from_events(
+            events,
+            params["bpm"],
+            time_sig=params["time_sig"],
+            spans=spans,
+            metronome_enabled=params["metronome"],
+        )
+
+    bars = split_into_bars(events_to_steps(events), meter.bar_units)
+    if kind == "events":
+        body = {"events": events, "spans": spans, "bar_units": meter.bar_units, "bars": len(bars)}
+        return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+    annotations = None
+    if params["show_char_brackets"]:
+        annotations = annotations_for_bars(spans, len(bars), meter.bar_units)
+    if kind == "score":
+        svg = render_score_svg(
+            bars,
+            meter,
+            annotations=annotations,
+            show_inactive_labels=params["show_inactive_labels"],
+            width=SVG_WIDTH,
+            height=SVG_HEIGHT,
+        )
+        return svg.encode("utf-8")
+
+    # Requests already run in parallel on the service pool, so bars of one
+    # request render serially inside the worker
+    svgs = render_bars_svg(
+        bars,
+        meter,
+        annotations=annotations,
+        show_inactive_labels=params["show_inactive_labels"],
+        width=SVG_WIDTH,
+        height=SVG_HEIGHT,
+        compact=True,
+        executor="serial",
+    )
+    return json.dumps({"bars": svgs}, separators=(",", ":")).encode("utf-8")
+
+
+class RenderService:
+    # Bounded worker pool in front of render_payload, with an LRU of bodies
+    # and optionally a disk cache shared with other processes
+    def __init__(
+        self,
+        workers=4,
+        max_pending=None,
+        executor="process",
+        cache_size=512,
+        disk_cache=None,
+    ):
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        self.pool = pool_class(max_workers=workers)
+        # Rendering plus queued jobs; beyond this callers get 503
+        self.slots = threading.BoundedSemaphore(max_pending or workers * 4)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_cache = disk_cache
+
+    def _cached(self, etag):
+        with self.lock:
+            body = self.cache.get(etag)
+            if body is not None:
+                self.cache.move_to_end(etag)
+            return body
+
+    def _store(self, etag, body):
+        with self.lock:
+            self.cache[etag] = body
+            self.cache.move_to_end(etag)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def handle(self, kind, payload, if_none_match=None):
+        # Returns (status, headers, body)
+        if kind not in CONTENT_TYPES:
+            raise RequestError(404, f"unknown output {kind!r}")
+        params = normalize_request(payload)
+        if not params["text"] and kind in DOCUMENT_KINDS:
+            raise RequestError(400, "text has no characters that can be sent as Morse")
+        etag = request_etag(kind, params)
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return 304, headers, b""
+
+        body = self._cached(etag)
+        if body is None and self.disk_cache is not None:
+            body = self.disk_cache.get(kind, params)
+            if body is not None:
+                self._store(etag, body)
+        if body is None:
+            if not self.slots.acquire(blocking=False):
+                raise RequestError(503, "render queue is full")
+            try:
+                body = self.pool.submit(render_payload, kind, params).result()
+            finally:
+                self.slots.release()
+            self._store(etag, body)
+            if self.disk_cache is not None and body:
+                self.disk_cache.put(kind, params, body)
+        headers["Content-Type"] = CONTENT_TYPES[kind]
+        return 200, headers, body
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MorseRhythm/1.0"
+    # Headers and body are separate writes on a keep-alive connection;
+    # without TCP_NODELAY the body waits on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        headers = {"Content-Type": "application/json"}
+        if status == 503:
+            headers["Retry-After"] = "1"
+        body = json.dumps({"error": message}).encode("utf-8")
+        self._send(status, headers, body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"Content-Type": "application/json"}, b'{"status":"ok"}')
+        else:
+            self._send_error(404, "not found")
+
+    def do_POST(self):
+        prefix = "/render/"
+        if not self.path.startswith(prefix):
+            self._send_error(404, "not found")
+            return
+        body_read = False
+        try:
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                raise RequestError(400, "Content-Length must be an integer") from None
+            if length < 0:
+                raise RequestError(400, "Content-Length must not be negative")
+            if length > MAX_BODY_BYTES:
+                # Refused before reading, so the body is never buffered
+                raise RequestError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+            data = self.rfile.read(length)
+            body_read = True
+            try:
+                payload = json.loads(data or b"{}")
+            except ValueError:
+                raise RequestError(400, "body is not valid JSON") from None
+            status, headers, body = self.server.service.handle(
+                self.path[len(prefix):],
+                payload,
+                if_none_match=self.headers.get("If-None-Match"),
+            )
+        except RequestError as exc:
+            if not body_read:
+                # The unread body would be parsed as the next request
+                self.close_connection = True
+            self._send_error(exc.status, str(exc))
+            return
+        except Exception:
+            logger.exception("render failed path=%s", self.path)
+            self._send_error(500, "render failed")
+            return
+        self._send(status, headers, body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+class RenderHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Let bursts queue in the kernel; the worker pool applies backpressure
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=8502, **service_options):
+    httpd = RenderHTTPServer((host, port), RenderHandler)
+    httpd.service = RenderService(**service_options)
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Morse rhythm render service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--executor", choices=("process", "thread"), default="process")
+    parser.add_argument("--cache-size", type=int, default=512)
+    parser.add_argument("--cache-dir", help="disk cache shared with other processes")
+    parser.add_argument("--cache-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    setup_logging()
+    httpd = make_server(
+        args.host,
+        args.port,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        executor=args.executor,
+        cache_size=args.cache_size,
+        disk_cache=DiskCache(args.cache_dir, args.cache_mb * 1024 * 1024)
+        if args.cache_dir
+        else None,
+    )
+    logger.info("serving on http://%s:%s", args.host, httpd.server_address[1])
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.service.close()
+
+
+if __name__ == "__main__":
+    main()
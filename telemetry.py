@@ -0,0 +1,169 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+
+LOGGER_NAME = "morse_rhythm"
+# "hash" (default), "truncate" or "none" for how user text appears in logs
+TEXT_MODE = os.environ.get("MORSE_RHYTHM_LOG_TEXT", "hash")
+TEXT_PREVIEW_CHARS = 32
+# Fraction of input events written to the log; metrics still count all
+SAMPLE_RATE = float(os.environ.get("MORSE_RHYTHM_LOG_SAMPLE", "1.0"))
+FLUSH_SECONDS = float(os.environ.get("MORSE_RHYTHM_METRICS_SECONDS", "60"))
+LENGTH_BUCKETS = (10, 20, 50, 100, 500)
+
+_listener = None
+_metrics = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line; structured fields come from extra={"fields": ...}
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+def setup_logging(level=logging.INFO, stream=None):
+    # Safe to call on every Streamlit rerun; the listener starts once and
+    # the caller's thread only ever enqueues records
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is None:
+            log_queue = queue.SimpleQueue()
+            handler = logging.StreamHandler(stream or sys.stderr)
+            handler.setFormatter(JsonFormatter())
+            _listener = QueueListener(log_queue, handler, respect_handler_level=False)
+            _listener.start()
+            atexit.register(_listener.stop)
+            logger.addHandler(QueueHandler(log_queue))
+            logger.setLevel(level)
+            logger.propagate = False
+    return logger
+
+
+def text_fingerprint(text, mode=None):
+    # Log-safe description of user text: length plus a hash or a preview
+    mode = mode or TEXT_MODE
+    fields = {"text_len": len(text)}
+    if mode == "hash":
+        fields["text_sha"] = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    elif mode == "truncate":
+        fields["text"] = text[:TEXT_PREVIEW_CHARS]
+        if len(text) > TEXT_PREVIEW_CHARS:
+            fields["text_truncated"] = True
+    return fields
+
+
+def log_event(logger, event, sample_rate=None, **fields):
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return False
+    logger.info(event, extra={"fields": fields})
+    return True
+
+
+def _length_bucket(length):
+    for bound in LENGTH_BUCKETS:
+        if length < bound:
+            return f"<{bound}"
+    return f">={LENGTH_BUCKETS[-1]}"
+
+
+class UsageMetrics:
+    # In-process counters, written as one log record per flush interval
+    def __init__(self, logger, interval=FLUSH_SECONDS):
+        self.logger = logger
+        self.interval = interval
+        self.lock = threading.Lock()
+        self._reset()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _reset(self):
+        self.started = time.time()
+        self.reruns = 0
+        self.inputs = 0
+        self.texts = set()
+        self.lengths = Counter()
+        self.meters = Counter()
+        self.tempos = Counter()
+
+    def record_rerun(self):
+        with self.lock:
+            self.reruns += 1
+
+    def record_input(self, text, time_sig, bpm):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()[:8]
+        with self.lock:
+            self.inputs += 1
+            self.texts.add(digest)
+            self.lengths[_length_bucket(len(text))] += 1
+            self.meters[time_sig] += 1
+            self.tempos[bpm] += 1
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            snapshot = {
+                "window_s": round(time.time() - self.started, 1),
+                "reruns": self.reruns,
+                "inputs": self.inputs,
+                "unique_texts": len(self.texts),
+                "length_histogram": dict(self.lengths),
+                "time_signatures": dict(self.meters),
+                "tempos": {str(bpm): count for bpm, count in sorted(self.tempos.items())},
+            }
+            if reset:
+                self._reset()
+        return snapshot
+
+    def flush(self):
+        snapshot = self.snapshot(reset=True)
+        if snapshot["reruns"] or snapshot["inputs"]:
+            self.logger.info("usage_metrics", extra={"fields": snapshot})
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="usage-metrics", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+def usage_metrics():
+    # Process-wide metrics with a background flusher, created on first use
+    global _metrics
+    with _setup_lock:
+        if _metrics is None:
+            _metrics = UsageMetrics(logging.getLogger(LOGGER_NAME))
+            _metrics.start()
+    return _metrics